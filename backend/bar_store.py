@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+分钟K线增量缓存
+首次回填几天的分钟线，之后只向上游请求比本地最后一根更新的K线
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from batch_fetcher import BatchQuoteFetcher
+from price_history import PriceHistory
+
+BAR_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+# Yahoo 的1分钟线只能取最近约8天，缺口更大的股票改为重新回填
+MAX_INCREMENTAL_GAP = timedelta(days=7)
+# 最后一根K线落在同一时间桶内的股票一起增量下载
+START_BUCKET = '15min'
+
+
+class IntradayBarStore:
+    """按股票保存最近的分钟线，底层为列式环形缓冲区"""
+
+    def __init__(self, fetcher=None, history=None, backfill_period="5d"):
+        self.fetcher = fetcher or BatchQuoteFetcher()
+        self.history = history or PriceHistory()
+        self.backfill_period = backfill_period
+
+    def last_timestamp(self, symbol):
+        ts = self.history.last_timestamp(symbol)
+        if ts is None:
+            return None
+        return pd.Timestamp(ts, unit='s', tz='UTC')
+
+    def refresh(self, symbols, reference_close=None, now=None):
+        """增量刷新，只返回本次确实下载到K线的股票的报价
+
+        下载失败的股票不出现在结果中，调用方保留旧缓存并在下一轮重试
+        """
+        symbols = list(dict.fromkeys(symbols))
+        now = now or pd.Timestamp.now(tz='UTC')
+        backfill, groups = [], {}
+        for symbol in symbols:
+            last = self.last_timestamp(symbol)
+            if last is None or now - last > MAX_INCREMENTAL_GAP:
+                backfill.append(symbol)
+            else:
+                # 按最后一根K线的时间分组，停牌或久未更新的股票不会把整批的起点拉得很早
+                groups.setdefault(last.floor(START_BUCKET), []).append(symbol)
+
+        merged = set()
+        if backfill:
+            merged |= self._download_and_merge(backfill, period=self.backfill_period)
+        for bucket, group in sorted(groups.items()):
+            # 最后一根K线可能尚未收盘，从它之前开始重新拉取并覆盖
+            merged |= self._download_and_merge(group, start=bucket - timedelta(minutes=1))
+
+        return self.quotes([s for s in symbols if s in merged], reference_close)
+
+    def quotes(self, symbols, reference_close=None):
+        """基于本地K线向量化计算报价，reference_close 为交易日级前收盘价"""
+        return self.history.quotes(symbols, reference_close)
+
+    def _download_and_merge(self, symbols, **kwargs):
+        """下载并写入缓冲区，返回下载到K线的股票集合"""
+        merged = set()
+        for chunk, frame in self.fetcher.download_chunks(symbols, **kwargs):
+            if isinstance(frame, Exception):
+                print(f"获取K线失败 {chunk[:3]}...: {frame}")
+                continue
+            frame = BatchQuoteFetcher.normalize_frame(frame, chunk)
+            if frame is None:
+                print(f"K线下载结果为空 {chunk[:3]}...")
+                continue
+            merged |= self.merge_frame(frame, chunk)
+        return merged
+
+    def merge_frame(self, frame, symbols):
+        """把一批股票的K线写入环形缓冲区，重叠部分由缓冲区覆盖
+
+        整块只做一次 numpy 转换和时间换算，逐股票只传列切片，返回写入了K线的股票集合
+        """
+        frame = frame.sort_index()
+        index = frame.index
+        # 交易所本地日期决定交易日边界
+        local = index.tz_localize(None) if index.tz is not None else index
+        ts = index.as_unit('s').asi8
+        days = local.normalize().as_unit('s').asi8 // 86400
+        available = set(frame['Close'].columns)
+        columns = [s for s in symbols if s in available]
+        # 各字段为 (K线数, 股票数) 的矩阵
+        opens, highs, lows, closes, volumes = (
+            frame[field].reindex(columns=columns).to_numpy(dtype=np.float64) for field in BAR_FIELDS
+        )
+        valid = ~np.isnan(closes)
+        merged = set()
+        for j, symbol in enumerate(columns):
+            rows = valid[:, j]
+            if not rows.any():
+                continue
+            self.history.extend(
+                symbol, ts[rows], days[rows],
+                opens[rows, j], highs[rows, j], lows[rows, j], closes[rows, j], volumes[rows, j]
+            )
+            merged.add(symbol)
+        return merged
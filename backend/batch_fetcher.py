@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+批量行情抓取
+一次（或分块几次）下载全部股票的K线，报价由分钟线缓存计算
+"""
+
+import pandas as pd
+import yfinance as yf
+
+
+class BatchQuoteFetcher:
+    """批量K线下载器，替代逐只股票 yf.Ticker 的串行请求"""
+
+    def __init__(self, chunk_size=100, period="5d", interval="1m", client=None):
+        self.chunk_size = chunk_size
+        self.period = period
+        self.interval = interval
+        self.client = client  # UpstreamClient，提供时各分块并发下载
+
+    def download_chunks(self, symbols, **kwargs):
+        """按 chunk_size 分块下载，返回 [(chunk, frame 或异常), ...]"""
+        chunks = [symbols[i:i + self.chunk_size] for i in range(0, len(symbols), self.chunk_size)]
+
+        def download(chunk):
+            return self.download(chunk, **kwargs)
+
+        if self.client is not None:
+            return list(zip(chunks, self.client.map_blocking(download, chunks)))
+        results = []
+        for chunk in chunks:
+            try:
+                results.append((chunk, download(chunk)))
+            except Exception as e:
+                results.append((chunk, e))
+        return results
+
+    def download(self, symbols, **kwargs):
+        """一次HTTP往返下载多只股票的K线
+
+        各分块会在线程池里同时调用 yf.download，依赖新版 yfinance 每次调用独立的下载状态，
+        旧版本共用模块级结果表，并发调用会互相覆盖（见 requirements.txt 的最低版本）
+        """
+        params = {'period': self.period, 'interval': self.interval}
+        params.update(kwargs)
+        if 'start' in params:
+            # 指定起点时按起点增量下载
+            params.pop('period')
+        return yf.download(
+            symbols,
+            group_by='column',
+            auto_adjust=False,
+            threads=True,
+            progress=False,
+            **params
+        )
+
+    @staticmethod
+    def normalize_frame(frame, symbols):
+        """统一为 (字段, 股票) 两级列索引"""
+        if frame is None or frame.empty:
+            return None
+        if not isinstance(frame.columns, pd.MultiIndex):
+            frame = pd.concat({symbols[0]: frame}, axis=1).swaplevel(0, 1, axis=1)
+        return frame
@@ -13,14 +13,16 @@ from flask_cors import CORS
 # 添加当前目录到路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-# 导入已有的股票数据类
-from server import StockData
+# 复用 server 模块中已创建的股票数据和后台同步，不再另建一份（否则冷启动要重复拉取一遍）
+from server import start_background, stock_data
 
 app = Flask(__name__)
 CORS(app)
 
-# 初始化股票数据
-stock_data = StockData()
+@app.before_request
+def ensure_background_refresh():
+    """由 WSGI 服务器导入时在第一个请求时启动后台线程"""
+    start_background()
 
 # 静态文件服务
 @app.route('/')
@@ -37,7 +39,6 @@ def static_files(filename):
 @app.route('/api/prices')
 def get_prices():
     """获取实时股价"""
-    stock_data.update_prices()
     return jsonify({
         "prices": stock_data.prices,
         "last_update": stock_data.last_update,
@@ -47,11 +48,9 @@ def get_prices():
 @app.route('/api/all-data')
 def get_all_data():
     """获取所有数据"""
-    stock_data.update_prices()
-    
     # 获取股价详细信息
     prices_detail = {}
-    for symbol in ['RDDT', 'TSLA', 'UBER', 'COIN', 'CADL']:
+    for symbol in stock_data.watchlist:
         prices_detail[symbol] = stock_data.get_price_change(symbol)
     
     return jsonify({
@@ -80,9 +79,17 @@ def health():
     """健康检查"""
     return jsonify({"status": "ok", "message": "股票监控系统运行正常"})
 
+@app.route('/api/ready')
+def ready():
+    """就绪检查：预热完成前返回503"""
+    state = stock_data.readiness()
+    return jsonify(state), 200 if state["ready"] else 503
+
 if __name__ == '__main__':
     print("🚀 股票监控系统部署中...")
     print("📊 公开访问地址即将生成...")
+    # 不使用 reloader，启动时直接在后台预热，不等第一个请求
+    start_background()
     
     # 获取公开IP地址
     try:
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+HTTP 条件请求
+根据数据快照版本生成强 ETag / Last-Modified，命中时直接返回 304，不读取数据也不序列化
+"""
+
+import hashlib
+
+from flask import Response, request
+
+# 预压缩快照提供的内容编码
+ENCODINGS = ('br', 'gzip')
+
+
+def make_etag(*parts):
+    """由快照版本等字段生成 ETag（不含引号）"""
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:24]
+
+
+def encoded_etag(etag, encoding=None):
+    """不同内容编码是不同的表示，强 ETag 需要区分"""
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def with_validators(response, etag, last_modified=None):
+    """给响应加上 ETag、Last-Modified，并要求客户端每次都来验证"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    """请求带的 If-None-Match / If-Modified-Since 仍然有效时返回 304 响应，否则返回 None"""
+    if request.if_none_match:
+        # 客户端缓存的可能是任一编码的表示
+        for variant in (None,) + ENCODINGS:
+            if request.if_none_match.contains(encoded_etag(etag, variant)):
+                return with_validators(Response(status=304), encoded_etag(etag, variant), last_modified)
+        return None
+    since = request.if_modified_since
+    if last_modified is not None and since is not None and last_modified.replace(microsecond=0) <= since:
+        return with_validators(Response(status=304), etag, last_modified)
+    return None
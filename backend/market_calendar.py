@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+美股交易时段日历
+区分盘前、盘中、盘后、休市和节假日，并据此决定行情刷新间隔
+"""
+
+from datetime import date, datetime, time as dtime, timedelta
+from functools import lru_cache
+
+import pytz
+
+EXCHANGE_TZ = pytz.timezone('America/New_York')
+
+PRE_MARKET_OPEN = dtime(4, 0)
+REGULAR_OPEN = dtime(9, 30)
+REGULAR_CLOSE = dtime(16, 0)
+EARLY_CLOSE = dtime(13, 0)
+AFTER_HOURS_CLOSE = dtime(20, 0)
+
+PRE_MARKET = 'pre'
+REGULAR = 'regular'
+AFTER_HOURS = 'after'
+CLOSED = 'closed'
+
+# 各时段的刷新间隔（秒），None 表示不刷新。
+# 分钟线只下载常规时段（yf.download 未开启 prepost），盘前盘后数据不会变化，与休市一样不刷新
+REFRESH_INTERVALS = {
+    PRE_MARKET: None,
+    REGULAR: 15,
+    AFTER_HOURS: None,
+    CLOSED: None,
+}
+
+
+def _nth_weekday(year, month, weekday, n):
+    """某月第 n 个星期几（n=-1 表示最后一个）"""
+    if n > 0:
+        first = date(year, month, 1)
+        offset = (weekday - first.weekday()) % 7
+        return first + timedelta(days=offset + 7 * (n - 1))
+    last = date(year + (month // 12), month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    """复活节日期（公历，匿名算法）"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day):
+    """周六的节日提前到周五，周日的顺延到周一"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=16)
+def nyse_holidays(year):
+    """NYSE 全天休市的节假日"""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),   # 马丁·路德·金纪念日
+        _nth_weekday(year, 2, 0, 3),   # 总统日
+        _easter(year) - timedelta(days=2),  # 耶稣受难日
+        _nth_weekday(year, 5, 0, -1),  # 阵亡将士纪念日
+        _observed(date(year, 7, 4)),   # 独立日
+        _nth_weekday(year, 9, 0, 1),   # 劳动节
+        _nth_weekday(year, 11, 3, 4),  # 感恩节
+        _observed(date(year, 12, 25)),  # 圣诞节
+    }
+    # 元旦落在周六时不提前到上一年的周五
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # 六月节
+    return frozenset(holidays)
+
+
+@lru_cache(maxsize=16)
+def nyse_early_closes(year):
+    """13:00 提前收盘的交易日"""
+    days = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1)}  # 感恩节次日
+    for day in (date(year, 7, 3), date(year, 12, 24)):
+        if day.weekday() < 5:
+            days.add(day)
+    return frozenset(d for d in days if d.weekday() < 5 and d not in nyse_holidays(year))
+
+
+class MarketCalendar:
+    """美股交易时段日历，clock 可注入以便测试"""
+
+    def __init__(self, clock=None, intervals=None):
+        self.clock = clock or (lambda: datetime.now(pytz.utc))
+        self.intervals = dict(REFRESH_INTERVALS, **(intervals or {}))
+
+    def now(self, when=None):
+        """转换为交易所时间；无时区的时间按本地时间处理"""
+        when = when or self.clock()
+        return when.astimezone(EXCHANGE_TZ)
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and day not in nyse_holidays(day.year)
+
+    def regular_close(self, day):
+        return EARLY_CLOSE if day in nyse_early_closes(day.year) else REGULAR_CLOSE
+
+    def session(self, when=None):
+        """当前所处时段：pre / regular / after / closed"""
+        now = self.now(when)
+        day = now.date()
+        if not self.is_trading_day(day):
+            return CLOSED
+        t = now.time()
+        if PRE_MARKET_OPEN <= t < REGULAR_OPEN:
+            return PRE_MARKET
+        if REGULAR_OPEN <= t < self.regular_close(day):
+            return REGULAR
+        if self.regular_close(day) <= t < AFTER_HOURS_CLOSE:
+            return AFTER_HOURS
+        return CLOSED
+
+    def refresh_interval(self, when=None):
+        """当前时段的刷新间隔（秒），休市返回 None"""
+        return self.intervals[self.session(when)]
+
+    def previous_trading_day(self, day):
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def next_trading_day(self, day):
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def last_session_date(self, when=None):
+        """最近一个已开盘的常规交易时段日期（9:30 换日）"""
+        now = self.now(when)
+        day = now.date()
+        if self.is_trading_day(day) and now.time() >= REGULAR_OPEN:
+            return day
+        return self.previous_trading_day(day)
+
+    def last_session_end(self, when=None):
+        """最近一次常规交易收盘的时间（含提前收盘），不刷新期间以此判断缓存是否已是收盘数据"""
+        now = self.now(when)
+        day = now.date()
+        if not (self.is_trading_day(day) and now.time() >= self.regular_close(day)):
+            day = self.previous_trading_day(day)
+        return EXCHANGE_TZ.localize(datetime.combine(day, self.regular_close(day)))
+
+    def next_session_start(self, when=None):
+        """下一次常规交易开盘的时间"""
+        now = self.now(when)
+        day = now.date()
+        if not (self.is_trading_day(day) and now.time() < REGULAR_OPEN):
+            day = self.next_trading_day(day)
+        return EXCHANGE_TZ.localize(datetime.combine(day, REGULAR_OPEN))
+
+    def seconds_until_refresh(self, when=None, max_sleep=3600):
+        """距离下一次应当刷新的秒数；不刷新的时段睡到下一次开盘"""
+        interval = self.refresh_interval(when)
+        if interval is not None:
+            return interval
+        now = self.now(when)
+        return min(max((self.next_session_start(now) - now).total_seconds(), 1), max_sleep)
+
+    def is_fresh(self, cached_time, when=None):
+        """按当前时段判断缓存是否仍然有效"""
+        now = self.now(when)
+        cached_time = self.now(cached_time)
+        interval = self.refresh_interval(now)
+        if interval is None:
+            # 盘前、盘后和休市：收盘后取到的数据一直有效
+            return cached_time >= self.last_session_end(now)
+        return (now - cached_time).total_seconds() < interval
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+新闻去重索引
+同一篇通稿会被多家媒体转载，标题略有不同。入库时先按规范化URL精确去重，
+再对标题+摘要计算 64 位 SimHash，用分段 LSH 在亚线性时间内找到近似重复并归入同一簇
+"""
+
+import hashlib
+import re
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+
+# 不影响内容的跟踪参数
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|cmpid|ref|src|guccounter)$', re.IGNORECASE)
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+# 标题末尾的 " - Reuters" / " | CNBC" 等来源后缀
+SOURCE_SUFFIX = re.compile(r'\s+[-|–—]\s+[^-|–—]{1,40}$')
+PLACEHOLDER_SUMMARY = '点击查看详情'
+
+
+def canonical_url(url):
+    """规范化URL：统一大小写、去掉 www、跟踪参数、锚点和末尾斜杠"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)))
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit(('https', host, path, query, ''))
+
+
+def url_key(url):
+    return hashlib.blake2b(canonical_url(url).encode('utf-8'), digest_size=8).digest()
+
+
+def shingles(text, size=2):
+    """小写单词的 n-gram，短文本退化为单词"""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return words
+    return [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(text):
+    """64 位 SimHash：各特征哈希按位投票，向量化计算"""
+    features = shingles(text)
+    if not features:
+        return 0
+    hashes = np.frombuffer(
+        b''.join(hashlib.blake2b(f.encode('utf-8'), digest_size=8).digest() for f in features),
+        dtype='>u8'
+    )
+    # (特征数, 64) 的位矩阵，高位在前
+    bit_matrix = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1)
+    votes = bit_matrix.sum(axis=0, dtype=np.int64) * 2 - len(features)
+    fingerprint = np.packbits(votes > 0)
+    return int.from_bytes(fingerprint.tobytes(), 'big')
+
+
+def article_text(article):
+    title = SOURCE_SUFFIX.sub('', article.get('title', ''))
+    summary = article.get('summary', '')
+    if summary == PLACEHOLDER_SUMMARY:
+        summary = ''
+    return f"{title} {summary.rstrip('.')}"
+
+
+class DedupIndex:
+    """URL 精确去重 + SimHash 分段 LSH 近似去重
+
+    64 位指纹切成 bands 段，汉明距离不超过 bands - 1 的两篇文章至少有一段完全相同（抽屉原理），
+    因此只需比较与新文章某一段相同的候选，而不是全部已入库文章
+    """
+
+    def __init__(self, max_distance=3, bands=4):
+        if max_distance >= bands:
+            raise ValueError("max_distance 必须小于 bands")
+        self.max_distance = max_distance
+        self.bands = bands
+        self.band_bits = 64 // bands
+        self.band_mask = (1 << self.band_bits) - 1
+        self._urls = {}  # url 哈希 -> 簇代表的 url
+        self._fingerprints = {}  # 簇代表 url -> simhash
+        self._buckets = [{} for _ in range(bands)]  # 每段：段值 -> [簇代表 url]
+        self.clusters = {}  # 簇代表 url -> [重复文章的 url]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def _band_values(self, fingerprint):
+        return [(fingerprint >> (i * self.band_bits)) & self.band_mask for i in range(self.bands)]
+
+    def _find(self, key, fingerprint):
+        primary = self._urls.get(key)
+        if primary is not None:
+            return primary
+        if not fingerprint:
+            return None
+        for bucket, value in zip(self._buckets, self._band_values(fingerprint)):
+            for candidate in bucket.get(value, ()):
+                if bin(self._fingerprints[candidate] ^ fingerprint).count('1') <= self.max_distance:
+                    return candidate
+        return None
+
+    def add(self, article):
+        """登记文章；重复时归入已有的簇并返回簇代表 url，否则成为新簇代表并返回 None"""
+        url = article['url']
+        key = url_key(url)
+        with self._lock:
+            known = self._urls.get(key)
+        if known is not None:
+            # 已登记过的 url（簇代表或已归簇的重复）直接返回，不再重复归簇
+            return known
+        fingerprint = simhash(article_text(article))
+        with self._lock:
+            primary = self._find(key, fingerprint)
+            if primary is not None:
+                if key not in self._urls:
+                    self._urls[key] = primary
+                    self.clusters.setdefault(primary, []).append(url)
+                return primary
+            self._urls[key] = url
+            self._fingerprints[url] = fingerprint
+            if fingerprint:
+                for bucket, value in zip(self._buckets, self._band_values(fingerprint)):
+                    bucket.setdefault(value, []).append(url)
+            return None
+
+    def remove(self, url):
+        """移除一个簇代表（文章被淘汰时调用）"""
+        with self._lock:
+            fingerprint = self._fingerprints.pop(url, None)
+            if fingerprint is None:
+                return
+            for duplicate in self.clusters.pop(url, []) + [url]:
+                self._urls.pop(url_key(duplicate), None)
+            if fingerprint:
+                for bucket, value in zip(self._buckets, self._band_values(fingerprint)):
+                    members = bucket.get(value)
+                    if members is not None:
+                        members.remove(url)
+                        if not members:
+                            del bucket[value]
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+新闻全文倒排索引
+标题和摘要分词后按词建立倒排表，倒排表按发布时间排序，随入库增量更新。
+查询支持 AND / OR，从最新的文章开始求交、多路归并，取满 k 条即停止
+"""
+
+import bisect
+import heapq
+import re
+import threading
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has have in is it its of on or that the this to was were will with'.split())
+
+
+def tokenize(text):
+    """小写英文单词，去掉停用词"""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def parse_query(query):
+    """解析为析取范式：[[AND 的词...], ...]，各组之间为 OR
+
+    相邻的词默认 AND，AND 优先级高于 OR，例如 "tesla musk OR bitcoin" -> [['tesla', 'musk'], ['bitcoin']]
+    """
+    groups, current = [], []
+    for word in query.split():
+        if word.upper() == 'OR':
+            if current:
+                groups.append(current)
+            current = []
+        elif word.upper() != 'AND':
+            current.extend(tokenize(word))
+    if current:
+        groups.append(current)
+    return [list(dict.fromkeys(group)) for group in groups]
+
+
+class InvertedIndex:
+    """词 -> 按 (timestamp, url) 升序排列的倒排表"""
+
+    def __init__(self):
+        self._postings = {}  # term -> [(timestamp, url)]
+        self._members = {}  # term -> {url}，用于求交时 O(1) 判断
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def terms(article):
+        return set(tokenize(f"{article.get('title', '')} {article.get('summary', '')}"))
+
+    def add(self, article):
+        key = (article['timestamp'], article['url'])
+        with self._lock:
+            for term in self.terms(article):
+                bisect.insort(self._postings.setdefault(term, []), key)
+                self._members.setdefault(term, set()).add(key[1])
+
+    def remove(self, article):
+        key = (article['timestamp'], article['url'])
+        with self._lock:
+            for term in self.terms(article):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                pos = bisect.bisect_left(postings, key)
+                if pos < len(postings) and postings[pos] == key:
+                    del postings[pos]
+                    self._members[term].discard(key[1])
+                if not postings:
+                    del self._postings[term]
+                    del self._members[term]
+
+    def _match_all(self, terms):
+        """AND：沿最短倒排表从新到旧遍历，逐条检查是否出现在其余词中"""
+        if any(term not in self._postings for term in terms):
+            return
+        terms = sorted(terms, key=lambda t: len(self._postings[t]))
+        others = [self._members[t] for t in terms[1:]]
+        for key in reversed(self._postings[terms[0]]):
+            if all(key[1] in members for members in others):
+                yield key
+
+    def search(self, query, limit=20):
+        """返回最多 limit 个匹配的 (timestamp, url)，按时间倒序"""
+        groups = parse_query(query)
+        with self._lock:
+            # 各组结果都按时间倒序，多路归并后去重，取满即停
+            merged = heapq.merge(*(self._match_all(g) for g in groups), reverse=True)
+            results, seen = [], set()
+            for key in merged:
+                if key[1] in seen:
+                    continue
+                seen.add(key[1])
+                results.append(key)
+                if len(results) >= limit:
+                    break
+            return results
+
+    def __len__(self):
+        return len(self._postings)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+多新闻源聚合
+每个提供方一个适配器，负责拼请求参数和把返回结果整理成统一的新闻格式；
+聚合器并发请求所有已配置的提供方，各自有截止时间，超时或失败的直接跳过，
+结果按时间用堆做多路归并
+"""
+
+import asyncio
+import heapq
+import os
+from datetime import timedelta
+
+from news_time import parse_published
+from quota import PRIORITY_REFRESH
+from upstream import UpstreamError
+
+# 关注的公司和大盘相关的关键词
+SEARCH_QUERY = '(Tesla OR TSLA OR "Elon Musk" OR electric vehicle OR EV) OR (Uber OR UBER OR "ride sharing" OR gig economy) OR (Coinbase OR COIN OR cryptocurrency OR bitcoin OR crypto) OR (Reddit OR RDDT OR social media) OR (stock market OR stocks OR trading OR investment OR earnings OR market OR finance OR financial OR business OR economy OR Wall Street OR Nasdaq OR NYSE)'
+# 不支持复杂布尔表达式的提供方使用的简短关键词
+SIMPLE_KEYWORDS = 'stock market'
+
+SUMMARY_LENGTH = 150
+
+
+def normalize_articles(items, tz):
+    """把 [(title, description, url, source, published)] 整理成统一的新闻格式
+
+    发布时间整批解析、换算到北京时间；缺少标题、链接或时间无法解析的条目丢弃
+    """
+    kept = []
+    for title, description, url, source, published in items:
+        title = (title or '').strip()
+        # 只保留最基本的过滤条件
+        if not title or title == '[Removed]' or not url:
+            continue
+        kept.append((title, (description or '').strip(), url, source, published))
+    if not kept:
+        return []
+    timestamps, labels, valid = parse_published([item[4] for item in kept], tz)
+    articles = []
+    for (title, description, url, source, published), timestamp, label, ok in zip(kept, timestamps.tolist(), labels, valid):
+        if not ok:
+            print(f"无法解析新闻发布时间: {published!r}")
+            continue
+        # 处理摘要
+        summary = description if description else '点击查看详情'
+        if len(summary) > SUMMARY_LENGTH:
+            summary = summary[:SUMMARY_LENGTH] + '...'
+        articles.append({
+            'title': title,
+            'summary': summary,
+            'source': source or '权威媒体',
+            'url': url,
+            'sentiment': 'neutral',  # 入库前由情绪打分覆盖
+            'timestamp': timestamp,
+            'beijing_time': label
+        })
+    return articles
+
+
+class NewsProvider:
+    """新闻源适配器基类"""
+
+    name = None
+    url = None
+    timeout = 4  # 单个提供方的截止时间（秒）
+
+    def __init__(self, key, url=None, timeout=None):
+        self.key = key
+        self.url = url or self.url
+        self.timeout = timeout or self.timeout
+        self.total_results = None  # 上游报告的匹配总数（支持时）
+        self.max_page = None  # 上游允许翻到的最大页，超出后不再补拉
+
+    def params(self, page, batch_size, now):
+        raise NotImplementedError
+
+    def items(self, data):
+        """返回 [(title, description, url, source, published)]，接口报错时抛出 UpstreamError"""
+        raise NotImplementedError
+
+    def is_rate_limited(self, data):
+        return False
+
+    def is_page_limited(self, status, data):
+        """请求的页超出了账户允许的范围（重试也不会成功）"""
+        return False
+
+    def parse(self, data, tz):
+        """整理成统一格式，按时间倒序"""
+        articles = normalize_articles(self.items(data), tz)
+        articles.sort(key=lambda a: a['timestamp'], reverse=True)
+        return articles
+
+
+class NewsAPIProvider(NewsProvider):
+    name = 'newsapi'
+    url = 'https://newsapi.org/v2/everything'
+
+    def params(self, page, batch_size, now):
+        one_week_ago = now - timedelta(days=7)  # 放宽到一周内的相关新闻
+        return {
+            'q': SEARCH_QUERY,
+            'apiKey': self.key,
+            'language': 'en',
+            'sortBy': 'publishedAt',  # 按发布时间倒序排列
+            'from': one_week_ago.isoformat(),
+            'pageSize': batch_size,  # 每次取满一批，全部入库
+            'page': page
+        }
+
+    def items(self, data):
+        if data.get('status') != 'ok':
+            raise UpstreamError(f"NewsAPI错误: {data.get('message', '未知错误')}", data=data)
+        self.total_results = data.get('totalResults') or 0
+        return [
+            (a.get('title'), a.get('description'), a.get('url'),
+             (a.get('source') or {}).get('name'), a.get('publishedAt'))
+            for a in data.get('articles') or []
+        ]
+
+    def is_rate_limited(self, data):
+        return data.get('code') == 'rateLimited'
+
+    def is_page_limited(self, status, data):
+        # 免费版只能取前100条，翻到第2页返回 426 / maximumResultsReached
+        return status == 426 or data.get('code') == 'maximumResultsReached'
+
+
+class NewsDataProvider(NewsProvider):
+    name = 'newsdata'
+    url = 'https://newsdata.io/api/1/news'
+
+    def params(self, page, batch_size, now):
+        return {'apikey': self.key, 'q': SIMPLE_KEYWORDS, 'language': 'en', 'category': 'business'}
+
+    def items(self, data):
+        if data.get('status') != 'success':
+            raise UpstreamError(f"NewsData错误: {data.get('results')}", data=data)
+        return [
+            (a.get('title'), a.get('description'), a.get('link'), a.get('source_id'), a.get('pubDate'))
+            for a in data.get('results') or []
+        ]
+
+    def is_rate_limited(self, data):
+        results = data.get('results')
+        return isinstance(results, dict) and results.get('code') == 'RateLimitExceeded'
+
+
+class CurrentsProvider(NewsProvider):
+    name = 'currents'
+    url = 'https://api.currentsapi.services/v1/search'
+
+    def params(self, page, batch_size, now):
+        return {'apiKey': self.key, 'keywords': SIMPLE_KEYWORDS, 'language': 'en', 'page_size': batch_size}
+
+    def items(self, data):
+        if data.get('status') != 'ok':
+            raise UpstreamError(f"Currents错误: {data.get('msg') or data.get('status')}", data=data)
+        return [
+            (a.get('title'), a.get('description'), a.get('url'), a.get('author'), a.get('published'))
+            for a in data.get('news') or []
+        ]
+
+
+class MediastackProvider(NewsProvider):
+    name = 'mediastack'
+    url = 'http://api.mediastack.com/v1/news'
+
+    def params(self, page, batch_size, now):
+        return {
+            'access_key': self.key,
+            'keywords': SIMPLE_KEYWORDS,
+            'languages': 'en',
+            'sort': 'published_desc',
+            'limit': batch_size
+        }
+
+    def items(self, data):
+        if 'error' in data:
+            raise UpstreamError(f"Mediastack错误: {data['error'].get('message')}", data=data)
+        return [
+            (a.get('title'), a.get('description'), a.get('url'), a.get('source'), a.get('published_at'))
+            for a in data.get('data') or []
+        ]
+
+    def is_rate_limited(self, data):
+        return (data.get('error') or {}).get('code') == 'usage_limit_reached'
+
+
+PROVIDER_CLASSES = (NewsAPIProvider, NewsDataProvider, CurrentsProvider, MediastackProvider)
+
+
+def configured_providers(env=None):
+    """按环境变量启用提供方：<NAME>_KEY 为密钥，<NAME>_URL 可覆盖接口地址"""
+    env = os.environ if env is None else env
+    default_keys = {'newsapi': '0a41b0e0bebc4c0eb6e2e5fb55678304'}
+    providers = []
+    for cls in PROVIDER_CLASSES:
+        prefix = cls.name.upper()
+        key = env.get(f'{prefix}_KEY', default_keys.get(cls.name))
+        if key:
+            providers.append(cls(key, url=env.get(f'{prefix}_URL')))
+    return providers
+
+
+class NewsAggregator:
+    """并发请求多个提供方并按时间归并"""
+
+    def __init__(self, client, providers, quota, tz):
+        self.client = client
+        self.providers = {p.name: p for p in providers}
+        self.quota = quota
+        self.tz = tz
+
+    async def _fetch_one(self, provider, page, batch_size, now):
+        # 每次请求都消耗额度，不自动重试：失败后由调用方按重试间隔再申请额度
+        return await asyncio.wait_for(
+            self.client.get_json(provider.url, provider.params(page, batch_size, now), retries=0),
+            provider.timeout
+        )
+
+    def fetch(self, now, page=1, batch_size=100, priority=PRIORITY_REFRESH, names=None):
+        """返回 (按时间倒序归并后的新闻, {提供方: 状态})
+
+        状态为 ok / quota（额度不足，未请求）/ timeout / limit（页号超出上游允许范围）/ error
+        """
+        providers = [p for name, p in self.providers.items() if names is None or name in names]
+        status = {}
+        selected = []
+        for provider in providers:
+            if self.quota.try_acquire(provider.name, priority):
+                selected.append(provider)
+            else:
+                status[provider.name] = 'quota'
+        if not selected:
+            return [], status
+
+        async def gather():
+            return await asyncio.gather(
+                *(self._fetch_one(p, page, batch_size, now) for p in selected),
+                return_exceptions=True
+            )
+        results = self.client.run(gather())
+
+        feeds = []
+        for provider, data in zip(selected, results):
+            try:
+                if isinstance(data, BaseException):
+                    raise data
+                if provider.is_rate_limited(data):
+                    raise UpstreamError(f"{provider.name} 限流", data=data)
+                articles = provider.parse(data, self.tz)
+            except asyncio.TimeoutError:
+                print(f"⌛ {provider.name} 超过 {provider.timeout} 秒未返回，已跳过")
+                status[provider.name] = 'timeout'
+                continue
+            except Exception as e:
+                print(f"❌ {provider.name} 获取新闻失败: {e}")
+                status[provider.name] = self._classify_error(provider, e, page)
+                continue
+            print(f"📰 {provider.name}: {len(articles)} 条新闻")
+            status[provider.name] = 'ok'
+            feeds.append(articles)
+
+        # 各提供方的结果已按时间倒序，多路归并
+        return list(heapq.merge(*feeds, key=lambda a: a['timestamp'], reverse=True)), status
+
+    def _classify_error(self, provider, error, page):
+        """限流时当天不再请求；页号超限时记下最大页，之后不再为补拉花额度"""
+        code = getattr(error, 'status', None)
+        body = getattr(error, 'data', None)
+        body = body if isinstance(body, dict) else {}
+        if code == 429 or provider.is_rate_limited(body):
+            self.quota.budget(provider.name).exhaust()
+        if provider.is_page_limited(code, body):
+            provider.max_page = max(page - 1, 1)
+            return 'limit'
+        return 'error'
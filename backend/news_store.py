@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+本地新闻库
+上游每次拉取一整批（100条）新闻，整理一次后按发布时间有序保存，
+分页直接从本地切片，不再每页请求一次 NewsAPI
+"""
+
+import base64
+import bisect
+import json
+import threading
+
+
+def encode_cursor(article):
+    """把 (timestamp, url) 编码成不透明的游标"""
+    raw = json.dumps([article['timestamp'], article['url']], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """解析游标，格式不对时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        timestamp, url = json.loads(raw)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"无效的游标: {token}") from e
+    if not isinstance(timestamp, int) or not isinstance(url, str):
+        raise ValueError(f"无效的游标: {token}")
+    return timestamp, url
+
+
+class NewsStore:
+    """按发布时间排序、按URL去重的新闻列表"""
+
+    def __init__(self, max_articles=5000, dedup=None, index=None, tagger=None):
+        self.max_articles = max_articles
+        self.dedup = dedup  # DedupIndex，转载的近似重复文章不入库
+        self.index = index  # InvertedIndex，入库时增量建立全文索引
+        self.tagger = tagger  # SymbolTagger，入库时标注相关股票
+        self._keys = []  # (timestamp, url) 升序
+        self._articles = {}  # url -> 整理后的新闻
+        self.version = 0  # 有新文章时加一
+        self.modified = None  # 最近一次有新文章的时间
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, url):
+        return url in self._articles
+
+    def ingest(self, articles, now=None):
+        """写入一批已整理的新闻，返回其中新增的部分"""
+        added = []
+        with self._lock:
+            for article in articles:
+                url = article['url']
+                if url in self._articles:
+                    continue
+                if self.dedup is not None and self.dedup.add(article) is not None:
+                    continue
+                bisect.insort(self._keys, (article['timestamp'], url))
+                self._articles[url] = article
+                if self.index is not None:
+                    self.index.add(article)
+                if self.tagger is not None:
+                    self.tagger.add(article)
+                added.append(article)
+            # 超出容量时丢弃最旧的
+            overflow = len(self._keys) - self.max_articles
+            if overflow > 0:
+                for _, url in self._keys[:overflow]:
+                    article = self._articles.pop(url)
+                    if self.index is not None:
+                        self.index.remove(article)
+                    if self.tagger is not None:
+                        self.tagger.remove(article)
+                    if self.dedup is not None:
+                        self.dedup.remove(url)
+                del self._keys[:overflow]
+            if added:
+                self.version += 1
+                self.modified = now
+        return added
+
+    def _page_keys(self, page, per_page):
+        end = len(self._keys) - (page - 1) * per_page
+        if end <= 0:
+            return []
+        return self._keys[max(end - per_page, 0):end][::-1]
+
+    def page(self, page=1, per_page=10):
+        """第 page 页（从1开始），按时间倒序"""
+        with self._lock:
+            return [self._articles[url] for _, url in self._page_keys(page, per_page)]
+
+    def page_keys(self, page=1, per_page=10):
+        """第 page 页的 (timestamp, url) 列表，不取文章本身"""
+        with self._lock:
+            return self._page_keys(page, per_page)
+
+    def before(self, key=None, limit=10):
+        """游标分页：比 key=(timestamp, url) 更早的 limit 条，按时间倒序，返回 (新闻, 是否还有更多)
+
+        二分定位起点，翻到多深都是 O(log n + limit)；新入库的文章不会让已翻过的页错位
+        """
+        with self._lock:
+            end = len(self._keys) if key is None else bisect.bisect_left(self._keys, tuple(key))
+            start = max(end - limit, 0)
+            return [self._articles[url] for _, url in reversed(self._keys[start:end])], start > 0
+
+    def articles(self):
+        """全部新闻，按时间倒序"""
+        with self._lock:
+            return [self._articles[url] for _, url in reversed(self._keys)]
+
+    def search(self, query, limit=20):
+        """全文检索，按时间倒序返回最多 limit 条"""
+        if self.index is None:
+            return []
+        keys = self.index.search(query, limit)
+        with self._lock:
+            return [self._articles[url] for _, url in keys if url in self._articles]
+
+    def retag(self, symbols):
+        """股票列表变化时重建标注（对全部新闻重新扫描一遍）"""
+        if self.tagger is None:
+            return
+        with self._lock:
+            self.tagger.build(symbols)
+            for _, url in self._keys:
+                self.tagger.add(self._articles[url])
+            self.version += 1
+
+    def symbol_feed(self, symbol, page=1, per_page=10):
+        """某只股票的新闻分页，按时间倒序"""
+        if self.tagger is None:
+            return []
+        keys = self.tagger.feed(symbol, page, per_page)
+        with self._lock:
+            return [self._articles[url] for _, url in keys if url in self._articles]
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+新闻时间的批量处理
+一整批发布时间一次解析、一次换算到北京时间；日期分组的今天/昨天边界每批只算一次
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+def format_distinct(times, fmt):
+    """只格式化不重复的时刻再按下标展开，strftime 是逐个元素执行的，开销主要在这里"""
+    codes, uniques = pd.factorize(times)
+    labels = np.append(np.asarray(uniques.strftime(fmt), dtype=object), '')
+    return labels[codes].tolist()  # NaT 的下标为 -1，对应末尾的空串
+
+
+def parse_published(values, tz):
+    """批量解析发布时间
+
+    返回 (毫秒时间戳数组, 'MM-DD HH:MM' 本地时间列表, 是否解析成功的布尔数组)；
+    没有时区的时间按 UTC 处理
+    """
+    raw = pd.Series(values, dtype=object)
+    # 各提供方基本都是 ISO 8601，走快速路径；剩下的少数格式再逐个猜
+    times = pd.to_datetime(raw, utc=True, errors='coerce', format='ISO8601')
+    retry = times.isna() & raw.notna()
+    if retry.any():
+        times[retry] = pd.to_datetime(raw[retry], utc=True, errors='coerce', format='mixed')
+    valid = times.notna().to_numpy()
+    timestamps = np.where(valid, times.to_numpy(dtype='datetime64[ms]').astype(np.int64, copy=False), 0)
+    labels = format_distinct(times.dt.tz_convert(tz).dt.floor('min'), '%m-%d %H:%M')
+    return timestamps, labels, valid
+
+
+def day_boundaries(tz, now=None):
+    """当天、昨天、明天零点的毫秒时间戳"""
+    now = now or datetime.now(tz)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if hasattr(tz, 'localize'):
+        # pytz 时区需要重新定位零点的偏移
+        today = tz.localize(today.replace(tzinfo=None))
+    midnight = int(today.timestamp() * 1000)
+    day_ms = int(timedelta(days=1).total_seconds() * 1000)
+    return midnight - day_ms, midnight, midnight + day_ms
+
+
+def date_groups(timestamps, tz, now=None):
+    """按北京时间把毫秒时间戳分为 今天 / 昨天 / MM-DD"""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if not len(timestamps):
+        return []
+    yesterday, today, tomorrow = day_boundaries(tz, now)
+    groups = np.where(
+        (timestamps >= today) & (timestamps < tomorrow), '今天',
+        np.where((timestamps >= yesterday) & (timestamps < today), '昨天', '')
+    ).astype(object)
+    other = np.flatnonzero(groups == '')
+    if len(other):
+        local = pd.to_datetime(timestamps[other], unit='ms', utc=True).tz_convert(tz).floor('D')
+        groups[other] = format_distinct(local, '%m-%d')
+    return groups.tolist()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+本地持久化缓存（SQLite WAL）
+内存缓存之后的第二层：保存报价、分钟线和新闻及其抓取时间，
+进程重启后直接从磁盘读回，不必重新请求上游
+"""
+
+import io
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    symbol TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    fetched_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bars (
+    symbol TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS news_articles (
+    url TEXT PRIMARY KEY,
+    timestamp INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    fetched_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS news_articles_timestamp ON news_articles (timestamp);
+CREATE TABLE IF NOT EXISTS quota_usage (
+    provider TEXT NOT NULL,
+    day TEXT NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (provider, day)
+);
+"""
+
+
+class PersistentCache:
+    """SQLite 持久化缓存，每个线程一个连接"""
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('CACHE_DB', DEFAULT_PATH)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            # WAL 模式下读写互不阻塞，多个进程也可以同时读
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _write(self, sql, rows):
+        if not rows:
+            return
+        try:
+            conn = self.connection()
+            with conn:
+                conn.executemany(sql, rows)
+        except sqlite3.Error as e:
+            print(f"写入本地缓存失败: {e}")
+
+    def _read(self, sql, params=()):
+        try:
+            return self.connection().execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"读取本地缓存失败: {e}")
+            return []
+
+    # 报价
+    def save_quotes(self, quotes):
+        """quotes: {symbol: (quote, fetched_at)}"""
+        self._write(
+            'INSERT OR REPLACE INTO quotes (symbol, payload, fetched_at) VALUES (?, ?, ?)',
+            [(symbol, json.dumps(quote), fetched_at.isoformat()) for symbol, (quote, fetched_at) in quotes.items()]
+        )
+
+    def load_quotes(self):
+        return {
+            symbol: (json.loads(payload), datetime.fromisoformat(fetched_at))
+            for symbol, payload, fetched_at in self._read('SELECT symbol, payload, fetched_at FROM quotes')
+        }
+
+    def delete_quotes(self, symbols):
+        self._write('DELETE FROM quotes WHERE symbol = ?', [(s,) for s in symbols])
+        self._write('DELETE FROM bars WHERE symbol = ?', [(s,) for s in symbols])
+
+    # 分钟线
+    def save_bars(self, bars):
+        """bars: {symbol: PriceHistory.export() 的结果}"""
+        now = datetime.now().isoformat()
+        rows = []
+        for symbol, data in bars.items():
+            if data is None:
+                continue
+            buffer = io.BytesIO()
+            np.savez(buffer, **data)
+            rows.append((symbol, buffer.getvalue(), now))
+        self._write('INSERT OR REPLACE INTO bars (symbol, data, updated_at) VALUES (?, ?, ?)', rows)
+
+    def load_bars(self):
+        bars = {}
+        for symbol, blob in self._read('SELECT symbol, data FROM bars'):
+            try:
+                with np.load(io.BytesIO(blob)) as archive:
+                    bars[symbol] = {name: archive[name] for name in archive.files}
+            except (OSError, ValueError) as e:
+                print(f"读取{symbol}分钟线缓存失败: {e}")
+        return bars
+
+    # 新闻
+    def save_news_articles(self, articles, fetched_at, keep=5000):
+        """写入新文章，只保留最新的 keep 条"""
+        self._write(
+            'INSERT OR IGNORE INTO news_articles (url, timestamp, payload, fetched_at) VALUES (?, ?, ?, ?)',
+            [(a['url'], a['timestamp'], json.dumps(a, ensure_ascii=False), fetched_at.isoformat()) for a in articles]
+        )
+        if articles:
+            self._write(
+                'DELETE FROM news_articles WHERE url NOT IN '
+                '(SELECT url FROM news_articles ORDER BY timestamp DESC LIMIT ?)',
+                [(keep,)]
+            )
+
+    def load_news_articles(self, limit=5000):
+        """返回 (文章列表, 最近一次抓取时间)"""
+        rows = self._read(
+            f'SELECT payload, fetched_at FROM news_articles ORDER BY timestamp DESC LIMIT {int(limit)}')
+        articles = [json.loads(payload) for payload, _ in rows]
+        fetched_at = max((datetime.fromisoformat(f) for _, f in rows), default=None)
+        return articles, fetched_at
+
+    # 上游额度（多进程共用计数）
+    def quota_used(self, provider, day):
+        rows = self._read('SELECT used FROM quota_usage WHERE provider = ? AND day = ?', (provider, day))
+        return rows[0][0] if rows else 0
+
+    def consume_quota(self, provider, day, ceiling):
+        """用量小于 ceiling 时加一并返回 True，整个判断在一条语句内完成"""
+        try:
+            conn = self.connection()
+            with conn:
+                conn.execute('DELETE FROM quota_usage WHERE provider = ? AND day < ?', (provider, day))
+                cursor = conn.execute(
+                    'INSERT INTO quota_usage (provider, day, used) SELECT ?, ?, 1 WHERE ? > 0 '
+                    'ON CONFLICT (provider, day) DO UPDATE SET used = used + 1 WHERE used < ?',
+                    (provider, day, ceiling, ceiling)
+                )
+                return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"更新额度计数失败: {e}")
+            return False
+
+    def exhaust_quota(self, provider, day, limit):
+        self._write(
+            'INSERT INTO quota_usage (provider, day, used) VALUES (?, ?, ?) '
+            'ON CONFLICT (provider, day) DO UPDATE SET used = MAX(used, excluded.used)',
+            [(provider, day, limit)]
+        )
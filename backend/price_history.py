@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+列式环形缓冲区
+每只股票固定容量的 timestamp/open/high/low/close/volume 数组，
+O(1) 追加，窗口读取零拷贝，报价对全部股票向量化计算
+"""
+
+import threading
+
+import numpy as np
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+
+
+class PriceHistory:
+    """固定容量的多股票K线环形缓冲区
+
+    每个值同时写入 pos 和 pos + capacity 两个位置（镜像写），
+    因此任意长度不超过 capacity 的最近窗口都是一段连续切片，可以直接返回视图。
+    """
+
+    def __init__(self, capacity=512, initial_symbols=64):
+        self.capacity = capacity
+        self.symbols = []  # 行号 -> 股票，已释放的行为 None
+        self.index = {}
+        self.free_rows = []  # 已释放、可复用的行号
+        self._lock = threading.Lock()
+        self._allocate(initial_symbols)
+
+    def _allocate(self, rows):
+        width = self.capacity * 2
+        self.timestamp = np.zeros((rows, width), dtype=np.int64)  # 秒级时间戳
+        # 价格用 float64：float32 只有约7位有效数字，BRK-A 这类高价股会丢失分位
+        for field in PRICE_FIELDS:
+            setattr(self, field, np.full((rows, width), np.nan, dtype=np.float64))
+        self.volume = np.zeros((rows, width), dtype=np.float64)
+        self.head = np.zeros(rows, dtype=np.int64)  # 下一个写入位置
+        self.count = np.zeros(rows, dtype=np.int64)
+        # 交易日状态：当前交易日、当日开盘价、前一交易日收盘价
+        self.session_day = np.full(rows, -1, dtype=np.int64)
+        self.session_open = np.full(rows, np.nan, dtype=np.float64)
+        self.previous_close = np.full(rows, np.nan, dtype=np.float64)
+
+    def _grow(self):
+        """股票数超过行数时按两倍扩容"""
+        old = {name: getattr(self, name) for name in self._array_names()}
+        rows = len(self.head)
+        self._allocate(rows * 2)
+        for name, values in old.items():
+            getattr(self, name)[:rows] = values
+
+    @staticmethod
+    def _array_names():
+        return ('timestamp',) + PRICE_FIELDS + (
+            'volume', 'head', 'count', 'session_day', 'session_open', 'previous_close')
+
+    @property
+    def nbytes(self):
+        """当前占用的数组内存（字节）"""
+        return sum(getattr(self, name).nbytes for name in self._array_names())
+
+    def row(self, symbol):
+        """股票对应的行号，不存在时分配新行"""
+        row = self.index.get(symbol)
+        if row is None:
+            if self.free_rows:
+                row = self.free_rows.pop()
+                self.symbols[row] = symbol
+            else:
+                if len(self.symbols) == len(self.head):
+                    self._grow()
+                row = len(self.symbols)
+                self.symbols.append(symbol)
+            self.index[symbol] = row
+        return row
+
+    def remove(self, symbol):
+        """释放股票占用的行，之后加入的股票复用该行，反复增删不会让数组无限增长"""
+        with self._lock:
+            row = self.index.pop(symbol, None)
+            if row is None:
+                return
+            self.head[row] = 0
+            self.count[row] = 0
+            self.session_day[row] = -1
+            self.session_open[row] = np.nan
+            self.previous_close[row] = np.nan
+            self.symbols[row] = None
+            self.free_rows.append(row)
+
+    def last_timestamp(self, symbol):
+        row = self.index.get(symbol)
+        if row is None or self.count[row] == 0:
+            return None
+        return int(self.timestamp[row, self.head[row] - 1 + self.capacity])
+
+    def append(self, symbol, ts, day, o, h, l, c, v):
+        """追加一根K线；时间戳与最后一根相同时覆盖，更早的忽略"""
+        self.extend(symbol, [ts], [day], [o], [h], [l], [c], [v])
+
+    def extend(self, symbol, ts, days, o, h, l, c, v):
+        """批量追加K线，要求按时间升序"""
+        ts = np.asarray(ts, dtype=np.int64)
+        days = np.asarray(days, dtype=np.int64)
+        columns = [np.asarray(values, dtype=np.float64) for values in (o, h, l, c, v)]
+        with self._lock:
+            row = self.row(symbol)
+            cap = self.capacity
+            last_ts = self.last_timestamp(symbol)
+            if last_ts is not None:
+                keep = ts >= last_ts
+                ts, days = ts[keep], days[keep]
+                columns = [values[keep] for values in columns]
+                if len(ts) and ts[0] == last_ts:
+                    # 最后一根K线尚未收盘，回退一格覆盖
+                    self.head[row] = (self.head[row] - 1) % cap
+                    self.count[row] -= 1
+            if not len(ts):
+                return
+
+            self._update_session(row, days, columns[0], columns[3])
+
+            if len(ts) > cap:
+                ts, days = ts[-cap:], days[-cap:]
+                columns = [values[-cap:] for values in columns]
+            pos = (self.head[row] + np.arange(len(ts))) % cap
+            targets = (pos, pos + cap)
+            for target in targets:
+                self.timestamp[row, target] = ts
+                for field, values in zip(PRICE_FIELDS, columns[:4]):
+                    getattr(self, field)[row, target] = values
+                self.volume[row, target] = np.nan_to_num(columns[4])
+            self.head[row] = (self.head[row] + len(ts)) % cap
+            self.count[row] = min(self.count[row] + len(ts), cap)
+
+    def _update_session(self, row, days, opens, closes):
+        """跨交易日时记录前收盘价和新交易日的开盘价"""
+        last_day = self.session_day[row]
+        last_close = np.nan
+        if self.count[row]:
+            last_close = self.close[row, self.head[row] - 1 + self.capacity]
+        prev_days = np.concatenate(([last_day], days[:-1]))
+        starts = np.flatnonzero(days != prev_days)
+        if not len(starts):
+            return
+        start = starts[-1]
+        self.session_day[row] = days[start]
+        self.session_open[row] = opens[start]
+        prev = closes[start - 1] if start > 0 else last_close
+        if last_day >= 0 or start > 0:
+            self.previous_close[row] = prev
+
+    def window(self, symbol, field='close', n=None):
+        """最近 n 根K线某一列的零拷贝视图（按时间升序）"""
+        row = self.index.get(symbol)
+        if row is None:
+            return getattr(self, field)[0, :0]
+        n = self.count[row] if n is None else min(n, self.count[row])
+        start = (self.head[row] - n) % self.capacity
+        return getattr(self, field)[row, start:start + n]
+
+    def export(self, symbol):
+        """导出一只股票的全部K线和交易日状态，用于持久化"""
+        with self._lock:
+            row = self.index.get(symbol)
+            if row is None or self.count[row] == 0:
+                return None
+            data = {field: self.window(symbol, field).copy() for field in ('timestamp',) + PRICE_FIELDS + ('volume',)}
+            data['session'] = np.array(
+                [self.session_day[row], self.session_open[row], self.previous_close[row]], dtype=np.float64)
+            return data
+
+    def restore(self, symbol, data):
+        """从 export() 的结果恢复一只股票（覆盖已有数据）"""
+        with self._lock:
+            row = self.row(symbol)
+            cap = self.capacity
+            n = min(len(data['timestamp']), cap)
+            for target in (slice(0, n), slice(cap, cap + n)):
+                self.timestamp[row, target] = data['timestamp'][-n:]
+                for field in PRICE_FIELDS + ('volume',):
+                    getattr(self, field)[row, target] = data[field][-n:]
+            self.head[row] = n % cap
+            self.count[row] = n
+            session_day, session_open, previous_close = data['session']
+            self.session_day[row] = int(session_day)
+            self.session_open[row] = session_open
+            self.previous_close[row] = previous_close
+
+    def quotes(self, symbols=None, reference_close=None):
+        """对全部股票向量化计算现价、前收、开盘、涨跌
+
+        reference_close 为 {symbol: 前收盘价}，优先于K线推算的前收盘价
+        """
+        with self._lock:
+            symbols = list(self.index) if symbols is None else [s for s in symbols if s in self.index]
+            rows = np.array([self.index[s] for s in symbols], dtype=np.int64)
+            if not len(rows):
+                return {}
+            rows = rows[self.count[rows] > 0]
+            last = self.head[rows] - 1 + self.capacity
+            current = self.close[rows, last].astype(np.float64)
+            volume = self.volume[rows, last]
+            previous_close = self.previous_close[rows].copy()
+            open_price = self.session_open[rows].copy()
+
+        names = [self.symbols[r] for r in rows]
+        if reference_close:
+            ref = np.array([reference_close.get(s, np.nan) for s in names], dtype=np.float64)
+            previous_close = np.where(np.isnan(ref), previous_close, ref)
+        previous_close = np.where(np.isnan(previous_close), current, previous_close)
+        open_price = np.where(np.isnan(open_price), previous_close, open_price)
+
+        current = np.round(current, 2)
+        previous_close = np.round(previous_close, 2)
+        change = np.round(current - previous_close, 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_percent = np.where(previous_close != 0, np.round(change / previous_close * 100, 2), 0.0)
+        open_price = np.round(open_price, 2)
+
+        return {
+            symbol: {
+                'current': float(current[i]),
+                'previous_close': float(previous_close[i]),
+                'open': float(open_price[i]),
+                'change': float(change[i]),
+                'change_percent': float(change_percent[i]),
+                'volume': int(volume[i])
+            }
+            for i, symbol in enumerate(names)
+        }
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+股价变化事件流
+刷新循环把发生变化的股价写入事件日志，SSE 连接按事件ID增量读取，支持断线续传
+"""
+
+import json
+import secrets
+import threading
+import time
+from collections import deque
+
+
+class PriceEventLog:
+    """带序号的股价变化日志，保留最近 max_events 条用于 Last-Event-ID 续传
+
+    序号只在本进程内递增，对外的事件ID带上日志的 epoch（"<epoch>-<序号>"），
+    重启后或重连到其他 worker 时 epoch 不同，客户端拿到的是快照而不是无关事件
+    """
+
+    def __init__(self, max_events=1000, epoch=None):
+        self.events = deque(maxlen=max_events)
+        self.last_id = 0
+        self.epoch = epoch or secrets.token_hex(4)
+        self._cond = threading.Condition()
+
+    def format_id(self, seq):
+        return f"{self.epoch}-{seq}"
+
+    def parse_id(self, event_id):
+        """解析客户端带回的事件ID，不是本日志发出的返回 None"""
+        epoch, _, seq = str(event_id).rpartition('-')
+        if epoch != self.epoch:
+            return None
+        try:
+            return int(seq)
+        except ValueError:
+            return None
+
+    def publish(self, changes):
+        """记录一批变化 {symbol: quote}，唤醒等待中的连接"""
+        if not changes:
+            return None
+        with self._cond:
+            self.last_id += 1
+            self.events.append((self.last_id, changes))
+            self._cond.notify_all()
+            return self.last_id
+
+    def since(self, last_id):
+        """返回 last_id 之后的事件；如果已超出保留范围无法续传，返回 None"""
+        with self._cond:
+            if last_id > self.last_id:
+                return None
+            if last_id == self.last_id:
+                return []
+            if not self.events or self.events[0][0] > last_id + 1:
+                return None
+            return [event for event in self.events if event[0] > last_id]
+
+    def wait(self, last_id, timeout):
+        """阻塞直到有比 last_id 更新的事件或超时"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.last_id > last_id, timeout)
+        return self.since(last_id)
+
+
+def format_sse(data, event=None, event_id=None):
+    """编码为一条 SSE 消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_events(log, snapshot, last_event_id=None, symbols=None, heartbeat=15, retry_ms=3000,
+                  on_heartbeat=None):
+    """SSE 生成器：连接时推送快照（或续传缺失的事件），之后只推送变化，空闲时发心跳
+
+    snapshot 为无参函数，返回 {symbol: quote} 全量数据；
+    on_heartbeat 每隔 heartbeat 秒调用一次，用于标记连接仍在查看这些股票
+    """
+    wanted = set(symbols) if symbols else None
+
+    def select(changes):
+        if wanted is None:
+            return changes
+        return {s: q for s, q in changes.items() if s in wanted}
+
+    yield f"retry: {retry_ms}\n\n"
+
+    cursor = log.last_id
+    missed = None
+    if last_event_id is not None:
+        seq = log.parse_id(last_event_id)
+        if seq is not None:
+            missed = log.since(seq)
+
+    if missed is None:
+        # 新连接、其他进程（或重启前）发出的ID、无法续传：先发全量快照
+        cursor = log.last_id
+        yield format_sse({'prices': select(snapshot())}, event='snapshot', event_id=log.format_id(cursor))
+    else:
+        for event_id, changes in missed:
+            cursor = event_id
+            changes = select(changes)
+            if changes:
+                yield format_sse({'prices': changes}, event='prices', event_id=log.format_id(event_id))
+
+    # 心跳按距上次写出的时间计算：过滤后的连接即使一直有其他股票的事件，也要按时发心跳
+    last_write = last_beat = time.monotonic()
+    while True:
+        deadline = min(last_write, last_beat) + heartbeat
+        events = log.wait(cursor, max(deadline - time.monotonic(), 0))
+        if events is None:
+            # 消费太慢，事件已被淘汰，重新发送快照
+            cursor = log.last_id
+            yield format_sse({'prices': select(snapshot())}, event='snapshot', event_id=log.format_id(cursor))
+            last_write = time.monotonic()
+            continue
+        for event_id, changes in events:
+            cursor = event_id
+            changes = select(changes)
+            if changes:
+                yield format_sse({'prices': changes}, event='prices', event_id=log.format_id(event_id))
+                last_write = time.monotonic()
+        now = time.monotonic()
+        if on_heartbeat and now - last_beat >= heartbeat:
+            on_heartbeat()
+            last_beat = now
+        if now - last_write >= heartbeat:
+            yield ": heartbeat\n\n"
+            last_write = now
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+上游新闻接口的额度预算
+每个提供方的日额度按时间均匀发放（令牌随时间线性累积），
+优先保证第一页刷新，补拉更早的新闻只能用富余的额度；额度紧张时直接用本地缓存
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+# 各提供方的免费额度（次/天），抄自仓库根目录 api_keys.py 的 NEWS_API_CONFIG[...]['free_limit']，
+# 修改时两处保持一致；mediastack 为每月500次
+PROVIDER_LIMITS = {
+    'newsapi': 100,
+    'newsdata': 200,
+    'currents': 600,
+    'mediastack': 500 // 31,
+}
+
+PRIORITY_REFRESH = 0  # 第一页/最新新闻
+PRIORITY_BACKFILL = 1  # 翻页补拉更早的新闻
+
+DAY_SECONDS = 86400
+
+
+class QuotaBudget:
+    """单个提供方的日额度
+
+    到当天某一时刻允许使用的次数 = 日额度 × 已过去的比例 + burst，
+    低优先级请求还需额外留出 reserve 次给高优先级，用量计数按 UTC 日期重置
+    """
+
+    def __init__(self, provider, daily_limit, store=None, burst=3, reserve=2, clock=None):
+        self.provider = provider
+        self.daily_limit = daily_limit
+        self.store = store  # PersistentCache，多进程共用同一份计数；None 时只在本进程内计数
+        self.burst = burst
+        self.reserve = reserve
+        self.clock = clock or time.time
+        self._used = {}  # 无 store 时的计数：日期 -> 次数
+        self._lock = threading.Lock()
+
+    def _today(self, now):
+        moment = datetime.fromtimestamp(now, timezone.utc)
+        midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        return moment.date().isoformat(), (moment - midnight).total_seconds()
+
+    def ceiling(self, priority=PRIORITY_REFRESH, now=None):
+        """当前时刻该优先级最多可以用到的次数"""
+        _, elapsed = self._today(self.clock() if now is None else now)
+        allowance = self.daily_limit * elapsed / DAY_SECONDS + self.burst
+        if priority != PRIORITY_REFRESH:
+            allowance -= self.reserve
+        return min(self.daily_limit, int(allowance))
+
+    def used(self, now=None):
+        day, _ = self._today(self.clock() if now is None else now)
+        if self.store is not None:
+            return self.store.quota_used(self.provider, day)
+        with self._lock:
+            return self._used.get(day, 0)
+
+    def try_acquire(self, priority=PRIORITY_REFRESH):
+        """申请一次调用额度，成功返回 True"""
+        now = self.clock()
+        day, _ = self._today(now)
+        ceiling = self.ceiling(priority, now)
+        if self.store is not None:
+            return self.store.consume_quota(self.provider, day, ceiling)
+        with self._lock:
+            if self._used.get(day, 0) >= ceiling:
+                return False
+            self._used = {day: self._used.get(day, 0) + 1}
+            return True
+
+    def seconds_until_available(self, priority=PRIORITY_REFRESH):
+        """距离下一次可用额度的秒数"""
+        now = self.clock()
+        used = self.used(now)
+        if used < self.ceiling(priority, now):
+            return 0
+        _, elapsed = self._today(now)
+        if used >= self.daily_limit:
+            return DAY_SECONDS - elapsed
+        offset = self.burst - (self.reserve if priority != PRIORITY_REFRESH else 0)
+        target = (used + 1 - offset) * DAY_SECONDS / self.daily_limit
+        return max(min(target, DAY_SECONDS) - elapsed, 1)
+
+    def exhaust(self):
+        """上游返回 429 等限流错误时，当天不再请求"""
+        day, _ = self._today(self.clock())
+        if self.store is not None:
+            self.store.exhaust_quota(self.provider, day, self.daily_limit)
+        else:
+            with self._lock:
+                self._used = {day: self.daily_limit}
+        print(f"⚠️ {self.provider} 额度已用尽，今日改用本地缓存")
+
+
+class QuotaBudgeter:
+    """按提供方管理额度"""
+
+    def __init__(self, store=None, limits=None):
+        self.store = store
+        self.limits = PROVIDER_LIMITS if limits is None else limits
+        self.budgets = {}
+        self._lock = threading.Lock()
+
+    def budget(self, provider):
+        with self._lock:
+            if provider not in self.budgets:
+                self.budgets[provider] = QuotaBudget(provider, self.limits[provider], self.store)
+            return self.budgets[provider]
+
+    def try_acquire(self, provider, priority=PRIORITY_REFRESH):
+        return self.budget(provider).try_acquire(priority)
+
+    def status(self, providers=None):
+        """各提供方当天的用量；providers 默认为所有有额度记录的提供方，尚未请求过的用量为0"""
+        status = {}
+        for provider in (self.limits if providers is None else providers):
+            budget = self.budget(provider)
+            used = budget.used()
+            status[provider] = {
+                "used": used,
+                "daily_limit": budget.daily_limit,
+                "available_now": max(budget.ceiling() - used, 0)
+            }
+        return status
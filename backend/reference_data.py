@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+交易日级参考数据缓存
+前收盘价等在一个交易时段内不会变化的字段，每个交易日每只股票只加载一次
+"""
+
+import threading
+import numpy as np
+
+from batch_fetcher import BatchQuoteFetcher
+from market_calendar import MarketCalendar
+
+
+class ReferenceDataCache:
+    """按交易日缓存前收盘价，开盘换日时自动失效"""
+
+    def __init__(self, fetcher=None, calendar=None):
+        self.fetcher = fetcher or BatchQuoteFetcher()
+        self.calendar = calendar or MarketCalendar()
+        self.session_key = None
+        self.previous_close = {}
+        self._lock = threading.Lock()
+
+    def _check_rollover(self):
+        # 最近一个已开盘交易时段的日期，开盘时换日
+        key = self.calendar.last_session_date()
+        if key != self.session_key:
+            self.session_key = key
+            self.previous_close = {}
+
+    def previous_closes(self, symbols):
+        """批量获取前收盘价，当日已加载的直接返回"""
+        with self._lock:
+            self._check_rollover()
+            session = self.session_key
+            missing = [s for s in symbols if s not in self.previous_close]
+        if missing:
+            loaded = self.load_previous_closes(missing, session)
+            with self._lock:
+                # 下载成功但没有数据的股票记为 None，避免同一交易日内反复请求
+                self.previous_close.update(loaded)
+        with self._lock:
+            return {s: self.previous_close[s] for s in symbols if self.previous_close.get(s) is not None}
+
+    def load_previous_closes(self, symbols, session=None):
+        """用日线一次下载全部股票，取日期早于最近交易时段 session 的最后一个收盘价
+
+        按日期而不是行的位置选取：刚开盘时当天的日线可能还没有生成。
+        下载失败的分块不出现在结果中，下次调用会重试
+        """
+        session = np.datetime64(session or self.calendar.last_session_date(), 'D')
+        closes = {}
+        for chunk, frame in self.fetcher.download_chunks(symbols, period="5d", interval="1d"):
+            if isinstance(frame, Exception):
+                print(f"获取前收盘价失败 {chunk[:3]}...: {frame}")
+                continue
+            frame = BatchQuoteFetcher.normalize_frame(frame, chunk)
+            if frame is None:
+                continue
+            closes.update(dict.fromkeys(chunk))
+            close = frame['Close']
+            values = close.to_numpy(dtype=float)
+            index = close.index.tz_localize(None) if close.index.tz is not None else close.index
+            before = (index.to_numpy().astype('datetime64[D]') < session)[:, None]
+            valid = ~np.isnan(values) & before
+            for i, symbol in enumerate(close.columns):
+                rows = np.flatnonzero(valid[:, i])
+                if len(rows):
+                    closes[symbol] = round(float(values[rows[-1], i]), 2)
+        return closes
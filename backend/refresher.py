@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+后台刷新服务
+按交易时段节奏刷新 StockData 缓存，API 请求只读取预先计算好的状态
+"""
+
+import threading
+import time
+
+
+class RefreshScheduler:
+    """后台定时刷新股价缓存，刷新间隔随交易时段变化"""
+
+    def __init__(self, stock_data, interval=None, batch_size=100, max_batches_per_second=2, retry_interval=30):
+        self.stock_data = stock_data
+        # 固定间隔（秒）；为 None 时按交易时段日历决定
+        self.interval = interval
+        # 上一轮失败或仍有股票没有报价时的重试间隔，休市时不必等到下一个刷新周期
+        self.retry_interval = retry_interval
+        # 每批股票数和批次速率上限，批次均匀分布在整个刷新周期内
+        self.batch_size = batch_size
+        self.min_batch_gap = 1.0 / max_batches_per_second
+        self.last_run = None
+        self.last_error = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()  # 自选股变化时提前结束等待
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动后台线程（重复调用无副作用）"""
+        with self._lock:
+            if self.running:
+                return
+            self._stop_event.clear()
+            self._wake_event.clear()
+            self._thread = threading.Thread(target=self._run, name='price-refresher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        """停止后台线程"""
+        with self._lock:
+            self._stop_event.set()
+            self._wake_event.set()
+            if self._thread is not None:
+                self._thread.join(timeout)
+                self._thread = None
+
+    def wake(self):
+        """立即开始下一轮刷新，新加入的股票不必等到下一个刷新周期（休市时可能长达一小时）"""
+        self._wake_event.set()
+
+    def current_interval(self):
+        if self.interval is not None:
+            return self.interval
+        return self.stock_data.calendar.seconds_until_refresh()
+
+    def refresh_once(self):
+        """执行一轮刷新：按优先级分批，批次之间限速；非盘中时只补齐收盘前取到的旧缓存"""
+        started = time.monotonic()
+        trading = self.stock_data.calendar.refresh_interval() is not None
+        batches = self.stock_data.watchlist.shards(self.batch_size, self.stock_data.has_price)
+        fetched = 0
+        if batches:
+            gap = max(self.current_interval() / len(batches), self.min_batch_gap) if trading else self.min_batch_gap
+            for i, batch in enumerate(batches):
+                if i and self._stop_event.wait(gap):
+                    break
+                fetched += self.stock_data.update_prices(batch, force=trading)
+        self.last_run = time.time()
+        # 本轮确实取到了报价（或全部股票都已有缓存）才算预热完成，全部下载失败时保持未就绪
+        symbols = self.stock_data.watchlist.symbols
+        if fetched or all(self.stock_data.has_price(s) for s in symbols):
+            self.stock_data.mark_prices_warm()
+        return time.monotonic() - started
+
+    def needs_retry(self):
+        """上一轮出错或有自选股还没有任何报价"""
+        if self.last_error is not None:
+            return True
+        return not all(self.stock_data.has_price(s) for s in self.stock_data.watchlist.symbols)
+
+    def next_wait(self, elapsed):
+        interval = self.current_interval()
+        if self.needs_retry():
+            interval = min(interval, self.retry_interval)
+        return max(interval - elapsed, 1)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                elapsed = self.refresh_once()
+                self.last_error = None
+            except Exception as e:
+                elapsed = 0
+                self.last_error = str(e)
+                print(f"后台刷新股价失败: {e}")
+            self._wake_event.wait(self.next_wait(elapsed))
+            self._wake_event.clear()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+新闻情绪打分
+基于金融词典的线性模型：词哈希到固定维度的权重向量，整批新闻的词一次性查表、
+按文章求和（np.bincount），否定词翻转后一个词的符号；结果按文章缓存，每篇只算一次
+"""
+
+import re
+import threading
+import zlib
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# 财经新闻常见的正面 / 负面词及权重
+POSITIVE_WORDS = {
+    'beat': 1.5, 'beats': 1.5, 'surge': 1.5, 'surges': 1.5, 'surged': 1.5, 'soar': 1.5, 'soars': 1.5,
+    'soared': 1.5, 'jump': 1.0, 'jumps': 1.0, 'jumped': 1.0, 'rally': 1.2, 'rallies': 1.2, 'rallied': 1.2,
+    'gain': 1.0, 'gains': 1.0, 'gained': 1.0, 'rise': 0.8, 'rises': 0.8, 'rose': 0.8, 'climb': 0.8,
+    'climbs': 0.8, 'up': 0.3, 'higher': 0.6, 'record': 0.8, 'strong': 1.0, 'stronger': 1.0, 'growth': 0.8,
+    'profit': 0.8, 'profitable': 1.0, 'upgrade': 1.5, 'upgrades': 1.5, 'upgraded': 1.5, 'outperform': 1.2,
+    'bullish': 1.5, 'boost': 1.0, 'boosts': 1.0, 'optimism': 1.0, 'optimistic': 1.0, 'approval': 1.0,
+    'approved': 1.0, 'wins': 1.0, 'win': 0.8, 'expands': 0.6, 'expansion': 0.6, 'breakthrough': 1.2,
+    'rebound': 1.0, 'rebounds': 1.0, 'recovery': 0.8, 'exceeds': 1.2, 'exceeded': 1.2, 'tops': 1.0,
+    'buy': 0.6, 'raises': 0.8, 'raised': 0.6, 'dividend': 0.5, 'partnership': 0.6, 'success': 1.0,
+}
+NEGATIVE_WORDS = {
+    'miss': 1.5, 'misses': 1.5, 'missed': 1.5, 'plunge': 1.8, 'plunges': 1.8, 'plunged': 1.8,
+    'crash': 2.0, 'crashes': 2.0, 'tumble': 1.5, 'tumbles': 1.5, 'tumbled': 1.5, 'fall': 1.0, 'falls': 1.0,
+    'fell': 1.0, 'drop': 1.0, 'drops': 1.0, 'dropped': 1.0, 'decline': 1.0, 'declines': 1.0, 'slump': 1.5,
+    'slumps': 1.5, 'sink': 1.2, 'sinks': 1.2, 'down': 0.3, 'lower': 0.6, 'loss': 1.2, 'losses': 1.2,
+    'weak': 1.0, 'weaker': 1.0, 'downgrade': 1.5, 'downgrades': 1.5, 'downgraded': 1.5, 'bearish': 1.5,
+    'lawsuit': 1.2, 'sued': 1.2, 'probe': 1.0, 'investigation': 1.0, 'recall': 1.2, 'recalls': 1.2,
+    'layoffs': 1.2, 'cuts': 0.8, 'cut': 0.6, 'warning': 1.0, 'warns': 1.0, 'fraud': 2.0, 'bankruptcy': 2.0,
+    'default': 1.2, 'fears': 1.0, 'fear': 1.0, 'concern': 0.8, 'concerns': 0.8, 'risk': 0.5, 'selloff': 1.5,
+    'sell': 0.6, 'fine': 0.8, 'fined': 1.2, 'delay': 0.8, 'delays': 0.8, 'halted': 1.2, 'volatile': 0.5,
+}
+NEGATORS = frozenset(['not', 'no', 'never', "isn't", "doesn't", "didn't", "won't", 'without', 'fails', 'failed'])
+
+
+class SentimentScorer:
+    """哈希特征 + 线性权重的批量情绪打分"""
+
+    def __init__(self, dimensions=1 << 18, threshold=0.15, cache_size=200000):
+        self.dimensions = dimensions
+        self.threshold = threshold  # |分数| 低于阈值视为中性
+        self.cache_size = cache_size
+        self.weights = np.zeros(dimensions, dtype=np.float32)
+        for word, weight in POSITIVE_WORDS.items():
+            self.weights[self.feature(word)] = weight
+        for word, weight in NEGATIVE_WORDS.items():
+            self.weights[self.feature(word)] = -weight
+        self._features = {}  # 词 -> 特征下标
+        self._cache = {}  # 文章 url -> 分数
+        self._lock = threading.Lock()
+
+    def feature(self, token):
+        return zlib.crc32(token.encode('utf-8')) % self.dimensions
+
+    def _feature_cached(self, token):
+        index = self._features.get(token)
+        if index is None:
+            index = self._features[token] = self.feature(token)
+        return index
+
+    def label(self, score):
+        if score >= self.threshold:
+            return 'positive'
+        if score <= -self.threshold:
+            return 'negative'
+        return 'neutral'
+
+    def score_texts(self, texts):
+        """对一批文本打分，返回 [-1, 1] 区间的 numpy 数组"""
+        features, doc_ids, negated = [], [], []
+        for doc, text in enumerate(texts):
+            previous = None
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                features.append(self._feature_cached(token))
+                doc_ids.append(doc)
+                negated.append(previous in NEGATORS)
+                previous = token
+        if not texts:
+            return np.zeros(0, dtype=np.float64)
+        features = np.asarray(features, dtype=np.int64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        contributions = self.weights[features].astype(np.float64)
+        contributions[np.asarray(negated, dtype=bool)] *= -1
+        totals = np.bincount(doc_ids, weights=contributions, minlength=len(texts))
+        lengths = np.bincount(doc_ids, minlength=len(texts))
+        # 按文本长度归一，再压缩到 [-1, 1]
+        return np.tanh(totals / np.sqrt(np.maximum(lengths, 1)))
+
+    def score_batch(self, articles):
+        """给新闻写入 sentiment（标签）和 sentiment_score，已打过分的直接用缓存"""
+        with self._lock:
+            pending = [a for a in articles if a['url'] not in self._cache]
+        if pending:
+            scores = self.score_texts([f"{a.get('title', '')} {a.get('summary', '')}" for a in pending])
+            with self._lock:
+                if len(self._cache) + len(pending) > self.cache_size:
+                    self._cache.clear()
+                for article, score in zip(pending, scores):
+                    self._cache[article['url']] = round(float(score), 3)
+        with self._lock:
+            for article in articles:
+                score = self._cache.get(article['url'], 0.0)
+                article['sentiment_score'] = score
+                article['sentiment'] = self.label(score)
+        return articles
+
+
+def summarize(articles):
+    """一组新闻的情绪汇总"""
+    scores = np.array([a.get('sentiment_score', 0.0) for a in articles], dtype=np.float64)
+    labels = [a.get('sentiment') for a in articles]
+    return {
+        "score": round(float(scores.mean()), 3) if len(scores) else 0.0,
+        "count": len(articles),
+        "positive": labels.count('positive'),
+        "negative": labels.count('negative'),
+        "neutral": labels.count('neutral')
+    }
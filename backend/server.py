@@ -6,15 +6,41 @@
 
 import json
 import time
-import requests
 from datetime import datetime, timedelta
-from flask import Flask, jsonify, render_template_string, send_from_directory
+from flask import Flask, Response, jsonify, render_template_string, request, send_from_directory, stream_with_context
 from flask_cors import CORS
 import threading
-import yfinance as yf
-import pandas as pd
 import pytz
 import os
+import atexit
+
+from batch_fetcher import BatchQuoteFetcher
+from upstream import UpstreamClient
+from bar_store import IntradayBarStore
+from reference_data import ReferenceDataCache
+from market_calendar import MarketCalendar
+from refresher import RefreshScheduler
+from singleflight import SingleFlight
+from watchlist import Watchlist
+from persistent_cache import PersistentCache
+from news_store import NewsStore, decode_cursor, encode_cursor
+from news_time import date_groups
+from quota import PRIORITY_BACKFILL, QuotaBudgeter
+from news_providers import NewsAggregator, configured_providers
+from news_dedup import DedupIndex
+from news_index import InvertedIndex
+from symbol_tagger import SymbolTagger
+from sentiment import SentimentScorer, summarize
+from shared_snapshot import SharedQuoteSync
+from price_stream import PriceEventLog, stream_events
+from ws_hub import SubscriptionHub
+from http_cache import make_etag, not_modified, with_validators
+from snapshot import SnapshotPublisher
+
+try:
+    from flask_sock import Sock
+except ImportError:  # 未安装 flask-sock 时不提供 WebSocket 接口
+    Sock = None
 
 app = Flask(__name__)
 CORS(app)
@@ -30,12 +56,11 @@ def static_files(filename):
     """提供静态文件"""
     return send_from_directory('frontend', filename)
 
-# 关注的股票列表
-WATCHLIST = ['RDDT', 'TSLA', 'UBER', 'COIN', 'CADL']
-
 # 真实股价数据（使用Yahoo Finance）
 class StockData:
-    def __init__(self):
+    def __init__(self, watchlist=None, persistent=None):
+        self.watchlist = watchlist or Watchlist()  # 关注的股票列表，运行时可增删
+        self.persistent = persistent or PersistentCache()  # 磁盘缓存，重启后先从这里读回
         self.prices = {}
         self.last_update = {}
         self.news = {}
@@ -43,88 +68,46 @@ class StockData:
         self.previous_prices = {}
         self.daily_changes = {}
         self.cache = {}
-        self.cache_timeout = 300  # 缓存5分钟，减少波动
+        self.calendar = MarketCalendar()  # 按交易时段决定缓存有效期
         
         # 缓存时区对象，避免重复创建
         self.beijing_tz = pytz.timezone('Asia/Shanghai')
-        self.cache_timeout = 300  # 5分钟缓存
-        self.news_cache = {}  # 新闻专用缓存
-        self.news_cache_timeout = 60  # 新闻缓存1分钟，确保能加载更多
+        # 本地新闻库（入库时去重并建立全文索引），分页和搜索直接从这里读取
+        self.news_store = NewsStore(dedup=DedupIndex(), index=InvertedIndex(), tagger=SymbolTagger())
+        self.news_store.retag(self.watchlist.symbols)
+        self.news_tagged_version = self.watchlist.version
+        self.sentiment = SentimentScorer()  # 入库前批量打情绪分
+        self.news_batch_size = 100  # 每次向各提供方取满一批
+        self.news_ingest_interval = 900  # 免费额度每天100次，15分钟拉取一次
+        self.news_retry_interval = 60  # 拉取失败后的重试间隔
+        self.news_checked_at = None  # 最近一次成功拉取的时间
+        self.news_backfill_page = 2  # 下一次补拉更早新闻的上游页号，None 表示没有更多
+        self.news_quota = QuotaBudgeter(self.persistent)  # 各新闻提供方的日额度
+        self.upstream = UpstreamClient()  # 上游HTTP连接池，分块下载也在这里并发执行
+        # 并发请求所有已配置的新闻提供方
+        self.news_aggregator = NewsAggregator(self.upstream, configured_providers(), self.news_quota, self.beijing_tz)
+        self.fetcher = BatchQuoteFetcher(client=self.upstream)  # 批量行情抓取
+        self.bar_store = IntradayBarStore(self.fetcher)  # 分钟线增量缓存
+        self.reference_data = ReferenceDataCache(self.fetcher, self.calendar)  # 交易日级前收盘价
+        self.flight = SingleFlight()  # 合并同一键的并发上游请求
+        self.listeners = []  # 股价变化回调，参数为 {symbol: quote}
+        # 股价快照版本：只有数据真正变化时才递增，用于 ETag / Last-Modified
+        self.prices_version = 0
+        # 区分进程重启前后的同号版本；读进程采用写进程的 epoch 和版本，所有 worker 的 ETag 一致
+        self.snapshot_epoch = int(time.time() * 1000)
+        self.prices_modified = datetime.now(pytz.utc)
+        self.bars_save_interval = 300  # 分钟线写盘间隔（秒）
+        self.bars_saved_at = 0
+        # 启动预热：构造时只读回本地报价，新闻库和首轮行情在后台完成，不阻塞端口绑定
+        self.prices_warm = False  # 行情是否已完成首轮刷新（本进程或共享区的写进程）
+        self.news_loaded = False  # 磁盘上的新闻库是否已读回
+        self._news_load_lock = threading.Lock()
+        self._warm_up_lock = threading.Lock()
+        self._warm_up_thread = None
         
         self.init_prices()
-        self.update_prices()
+        self.load_persistent()
         
-    def get_real_time_price(self, symbol):
-        """获取实时股价 - 优化版"""
-        try:
-            # 检查缓存
-            if symbol in self.cache:
-                cached_data, cached_time = self.cache[symbol]
-                if (datetime.now() - cached_time).seconds < self.cache_timeout:
-                    return cached_data
-            
-            # 从Yahoo Finance获取实时数据
-            ticker = yf.Ticker(symbol)
-            
-            # 获取两日数据以确保有前收盘价
-            data = ticker.history(period="5d", interval="1m")
-            info = ticker.info
-            
-            if not data.empty:
-                current_price = round(data['Close'].iloc[-1], 2)
-                
-                # 使用前收盘价作为基准（更稳定）
-                previous_close = info.get('previousClose') or info.get('regularMarketPreviousClose')
-                if not previous_close:
-                    # 如果没有previousClose，使用昨日最后价格
-                    yesterday_data = data[data.index.date == (datetime.now().date() - pd.Timedelta(days=1))]
-                    if not yesterday_data.empty:
-                        previous_close = round(yesterday_data['Close'].iloc[-1], 2)
-                    else:
-                        previous_close = round(data['Close'].iloc[-2], 2)
-                
-                # 计算涨跌幅（基于前收盘价）
-                change = round(current_price - previous_close, 2)
-                change_percent = round((change / previous_close) * 100, 2)
-                
-                # 获取今日开盘价
-                today_data = data[data.index.date == datetime.now().date()]
-                open_price = today_data['Open'].iloc[0] if not today_data.empty else previous_close
-                
-                result = {
-                    'current': current_price,
-                    'previous_close': round(previous_close, 2),
-                    'open': round(open_price, 2),
-                    'change': change,
-                    'change_percent': change_percent,
-                    'volume': int(data['Volume'].iloc[-1]) if not data['Volume'].empty else 0
-                }
-                
-                # 缓存结果（延长缓存时间）
-                self.cache[symbol] = (result, datetime.now())
-                return result
-            else:
-                return None
-                
-        except Exception as e:
-            print(f"获取{symbol}股价失败: {e}")
-            return None
-    
-    def get_date_group(self, time_obj):
-        """根据时间返回日期分组"""
-        now = datetime.now(self.beijing_tz)
-        today = now.date()
-        yesterday = today - timedelta(days=1)
-        
-        time_date = time_obj.date()
-        
-        if time_date == today:
-            return '今天'
-        elif time_date == yesterday:
-            return '昨天'
-        else:
-            return time_obj.strftime('%m-%d')
-    
     def init_prices(self):
         """初始化股价和基准价格"""
         base_prices = {
@@ -135,26 +118,190 @@ class StockData:
             'CADL': 2.34
         }
         
-        for symbol in WATCHLIST:
+        for symbol in self.watchlist:
             self.prices[symbol] = base_prices.get(symbol, 100.0)
             self.previous_prices[symbol] = base_prices.get(symbol, 100.0)
             self.daily_changes[symbol] = 0.0
     
-    def update_prices(self):
-        """更新股价数据，使用真实API"""
-        for symbol in WATCHLIST:
-            price_data = self.get_real_time_price(symbol)
-            if price_data:
+    def load_persistent(self):
+        """从磁盘缓存读回报价和分钟线，冷启动不必访问上游"""
+        quotes = self.persistent.load_quotes()
+        for symbol, (price_data, fetched_at) in quotes.items():
+            if symbol in self.watchlist:
+                self.cache[symbol] = (price_data, fetched_at)
                 self.prices[symbol] = price_data['current']
-                self.last_update[symbol] = datetime.now().isoformat()
+                self.last_update[symbol] = fetched_at.isoformat()
+        for symbol, data in self.persistent.load_bars().items():
+            if symbol in self.watchlist:
+                self.bar_store.history.restore(symbol, data)
+        if quotes:
+            self.bump_prices_version()
+    
+    def load_persistent_news(self):
+        """从磁盘读回新闻库（去重、索引、打分较慢，放在预热阶段），只执行一次"""
+        with self._news_load_lock:
+            if self.news_loaded:
+                return
+            articles, fetched_at = self.persistent.load_news_articles(self.news_store.max_articles)
+            if articles:
+                self.sentiment.score_batch(articles)
+                self.news_store.ingest(articles, fetched_at)
+                self.news_checked_at = fetched_at.astimezone(self.beijing_tz)
+            self.news_loaded = True
+            print(f"📰 已读回本地新闻 {len(self.news_store)} 条")
+    
+    def start_warm_up(self):
+        """在后台线程中预热新闻库（重复调用无副作用）"""
+        with self._warm_up_lock:
+            if self.news_loaded or self._warm_up_thread is not None:
+                return
+            self._warm_up_thread = threading.Thread(target=self.warm_up, name='warm-up', daemon=True)
+            self._warm_up_thread.start()
+    
+    def warm_up(self):
+        try:
+            self.load_persistent_news()
+        except Exception as e:
+            print(f"读回本地新闻失败: {e}")
+            self.news_loaded = True  # 以空库继续，之后从上游拉取
+    
+    def mark_prices_warm(self):
+        if not self.prices_warm:
+            self.prices_warm = True
+            print("✅ 行情预热完成")
+    
+    def readiness(self):
+        """就绪状态：新闻库已读回，且行情完成了首轮刷新或磁盘缓存已覆盖全部自选股"""
+        symbols = self.watchlist.symbols
+        cached = sum(1 for symbol in symbols if symbol in self.cache)
+        prices_ready = self.prices_warm or cached == len(symbols)
+        return {
+            "ready": self.news_loaded and prices_ready,
+            "news_loaded": self.news_loaded,
+            "prices_warm": self.prices_warm,
+            "cached_symbols": cached,
+            "symbols": len(symbols)
+        }
+    
+    def save_bars_if_due(self, symbols):
+        """按间隔把分钟线写盘，避免每次刷新都写大量数据"""
+        if time.time() - self.bars_saved_at < self.bars_save_interval:
+            return
+        self.bars_saved_at = time.time()
+        self.persistent.save_bars({s: self.bar_store.history.export(s) for s in symbols})
+    
+    def is_cache_fresh(self, symbol, now=None):
+        """缓存是否仍在有效期内：盘中几秒，盘前盘后和休市时收盘后的数据一直有效"""
+        if symbol not in self.cache:
+            return False
+        return self.calendar.is_fresh(self.cache[symbol][1], now)
+    
+    def has_price(self, symbol):
+        return symbol in self.cache
+    
+    def update_prices(self, symbols=None, force=False):
+        """更新股价数据，过期的股票一次批量下载；symbols 默认为整个自选股列表
+
+        返回本次从上游取到报价的股票数
+        """
+        # 本轮开始前已被移出自选股的不再下载
+        symbols = self.watchlist.symbols if symbols is None else [s for s in symbols if s in self.watchlist]
+        now = datetime.now()
+        stale = [symbol for symbol in symbols if force or not self.is_cache_fresh(symbol, now)]
+        changes = {}
+        fetched = {}
+        if stale:
+            previous_close = self.reference_data.previous_closes(stale)
+            fetched = self.bar_store.refresh(stale, previous_close)
+            # 下载期间被移出的股票丢弃结果，并释放刚写入的K线行
+            for symbol in [s for s in fetched if s not in self.watchlist]:
+                del fetched[symbol]
+                self.bar_store.history.remove(symbol)
+            for symbol, price_data in fetched.items():
+                if symbol not in self.cache or self.cache[symbol][0] != price_data:
+                    changes[symbol] = price_data
+                self.cache[symbol] = (price_data, now)
+            self.persistent.save_quotes({symbol: self.cache[symbol] for symbol in fetched})
+            self.save_bars_if_due(self.watchlist.symbols)
+        
+        # last_update 只记录价格真正变化的时间，数据不变时快照保持不变
+        for symbol, price_data in changes.items():
+            self.prices[symbol] = price_data['current']
+            self.last_update[symbol] = now.isoformat()
+        
+        if changes:
+            self.bump_prices_version()
+            self.notify(changes)
+        return len(fetched)
+    
+    def bump_prices_version(self):
+        self.prices_version += 1
+        self.prices_modified = datetime.now(pytz.utc)
+    
+    def add_listener(self, callback):
+        """注册股价变化回调"""
+        self.listeners.append(callback)
+    
+    def notify(self, changes):
+        for callback in self.listeners:
+            try:
+                callback(changes)
+            except Exception as e:
+                print(f"股价变化回调失败: {e}")
+    
+    def export_shared_quotes(self):
+        """导出全部报价，写进程发布到共享区"""
+        return {
+            "quotes": {s: [q, t.isoformat()] for s, (q, t) in list(self.cache.items())},
+            "last_update": dict(self.last_update),
+            "epoch": self.snapshot_epoch,
+            "version": self.prices_version,
+            "modified": self.prices_modified.isoformat(),
+            "warm": self.prices_warm
+        }
+    
+    def apply_shared_quotes(self, snapshot):
+        """读进程：合并共享区中的报价，并像本地刷新一样通知监听者
+
+        快照版本、修改时间和 last_update 都照搬写进程的，各 worker 对同一份数据给出相同的 ETag 和响应体
+        """
+        changes = {}
+        last_update = snapshot.get("last_update", {})
+        for symbol, (price_data, fetched_at) in snapshot.get("quotes", {}).items():
+            if symbol not in self.watchlist:
+                continue
+            if symbol not in self.cache or self.cache[symbol][0] != price_data:
+                changes[symbol] = price_data
+                self.prices[symbol] = price_data['current']
+            if symbol in last_update:
+                self.last_update[symbol] = last_update[symbol]
+            self.cache[symbol] = (price_data, datetime.fromisoformat(fetched_at))
+        if snapshot.get("warm"):
+            self.mark_prices_warm()
+        if "version" in snapshot:
+            self.snapshot_epoch = snapshot["epoch"]
+            self.prices_version = snapshot["version"]
+            self.prices_modified = datetime.fromisoformat(snapshot["modified"])
+        elif changes:
+            self.bump_prices_version()
+        if changes:
+            self.notify(changes)
+    
+    def forget_symbols(self, symbols):
+        """移出自选股后清理对应的价格状态"""
+        for symbol in symbols:
+            for state in (self.prices, self.last_update, self.previous_prices, self.daily_changes, self.cache):
+                state.pop(symbol, None)
+            self.bar_store.history.remove(symbol)
+        self.persistent.delete_quotes(symbols)
+        self.bump_prices_version()
     
     def get_price_change(self, symbol):
-        """获取价格变化信息 - 稳定版"""
-        price_data = self.get_real_time_price(symbol)
-        if price_data:
-            return price_data
+        """获取价格变化信息 - 稳定版，只读取后台刷新好的缓存"""
+        if symbol in self.cache:
+            return self.cache[symbol][0]
         else:
-            # 如果获取失败，使用缓存或默认值
+            # 后台尚未取到数据时返回默认值，不在请求线程里访问上游
             return {
                 'current': 0.0,
                 'previous_close': 0.0,
@@ -178,123 +325,150 @@ class StockData:
         """获取实时新闻 - 使用NewsAPI实时数据"""
         return self.get_newsapi_realtime_news(page, per_page)
     
-    def get_newsapi_realtime_news(self, page=1, per_page=10):
-        """优化的实时新闻获取 - 仅返回API真实数据"""
-        api_key = "0a41b0e0bebc4c0eb6e2e5fb55678304"
-        
-        # 使用缓存的时区对象
+    def news_is_fresh(self, now=None):
+        """本地新闻库在拉取间隔内是否检查过上游"""
+        if self.news_checked_at is None:
+            return False
+        now = now or datetime.now(self.beijing_tz)
+        return (now - self.news_checked_at).total_seconds() < self.news_ingest_interval
+    
+    def get_news_version(self, page=1, per_page=10):
+        """新闻库无需刷新时返回该页的 (ETag, 修改时间)，否则返回 None"""
         now = datetime.now(self.beijing_tz)
-        today = now.date()
-        
-        # 检查新闻专用缓存，分页缓存
-        cache_key = f"news_{page}_{per_page}_{today}"
-        if cache_key in self.news_cache:
-            cached_data, cached_time = self.news_cache[cache_key]
-            # 只对第一页使用较短缓存，其他页面缓存更长时间
-            cache_duration = self.news_cache_timeout if page == 1 else self.news_cache_timeout * 3
-            if (now - cached_time).total_seconds() < cache_duration:
-                return cached_data
+        if not self.news_is_fresh(now) or self.news_store.modified is None:
+            return None
+        # 由该页文章的 (timestamp, url) 生成，不用进程内的库版本号：
+        # 重启后或不同 worker 上同一版本号可能对应不同文章。
+        # 日期分组随日期变化、股票标注随自选股变化，也要计入
+        keys = self.news_store.page_keys(page, per_page)
+        etag = make_etag('news', keys, page, per_page, now.date(), self.watchlist.fingerprint)
+        return etag, self.news_store.modified
+    
+    def get_newsapi_realtime_news(self, page=1, per_page=10):
+        """从本地新闻库分页，库过期时先拉取一批最新新闻"""
+        if not self.news_is_fresh():
+            # 并发的请求只拉取一次
+            self.flight.do("news_ingest", self.refresh_news)
         
-        try:
-            # 优化：获取今日相关度高的新闻
-            url = "https://newsapi.org/v2/everything"
-            
-            # 大幅放宽搜索条件，覆盖更广泛的财经新闻
-            search_query = '(Tesla OR TSLA OR "Elon Musk" OR electric vehicle OR EV) OR (Uber OR UBER OR "ride sharing" OR gig economy) OR (Coinbase OR COIN OR cryptocurrency OR bitcoin OR crypto) OR (Reddit OR RDDT OR social media) OR (stock market OR stocks OR trading OR investment OR earnings OR market OR finance OR financial OR business OR economy OR Wall Street OR Nasdaq OR NYSE)'
-            
-            # 获取当前北京时间
-            now = datetime.now(self.beijing_tz)
-            one_week_ago = now - timedelta(days=7)  # 放宽到一周内的相关新闻
-            
-            params = {
-                'q': search_query,
-                'apiKey': api_key,
-                'language': 'en',
-                'sortBy': 'publishedAt',  # 按发布时间倒序排列
-                'from': one_week_ago.isoformat(),  # 使用动态计算的最近一周
-                'pageSize': min(per_page * 5, 100),  # 大幅增加结果缓冲区
-                'page': page
-            }
-            
-            # 🔧 优化：减少超时时间
-            response = requests.get(url, params=params, timeout=3)
-            response.raise_for_status()
-            data = response.json()
-            
-            print(f"📡 NewsAPI响应: {data.get('status')} - 总数: {data.get('totalResults')}")
-            if data.get('status') != 'ok':
-                print(f"❌ NewsAPI错误: {data.get('message', '未知错误')}")
-            
-            if data.get('status') == 'ok' and data.get('articles'):
-                print(f"📰 获取到 {len(data['articles'])} 条原始新闻")
-                news_list = []
-                processed_count = 0
-                
-                # 处理API返回的新闻，筛选高质量内容
-                for item in data['articles']:
-                    if processed_count >= per_page:
-                        break
-                        
-                    try:
-                        # 验证必要字段
-                        title = item.get('title', '').strip()
-                        description = item.get('description', '').strip()
-                        url = item.get('url', '')
-                        
-                        # 只保留最基本的过滤条件
-                        if not title or title == '[Removed]' or not url:
-                            continue
-                            
-                        published_at = item.get('publishedAt', now.isoformat())
-                        utc_time = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
-                        beijing_time = utc_time.astimezone(self.beijing_tz)
-                            
-                        # 处理摘要
-                        summary = description if description else '点击查看详情'
-                        if len(summary) > 150:
-                            summary = summary[:150] + '...'
-                            
-                        news_list.append({
-                            'title': title,
-                            'summary': summary,
-                            'source': item.get('source', {}).get('name', '权威媒体'),
-                            'url': url,
-                            'sentiment': 'positive',
-                            'timestamp': int(beijing_time.timestamp() * 1000),
-                            'beijing_time': beijing_time.strftime('%m-%d %H:%M'),
-                            'date_group': self.get_date_group(beijing_time)
-                        })
-                        processed_count += 1
-                        
-                    except (ValueError, AttributeError) as e:
-                        print(f"处理新闻项时出错: {e}")
-                        continue
-                
-                # 按时间倒序排列（NewsAPI已按时间排序，但再确认一次）
-                news_list.sort(key=lambda x: x['timestamp'], reverse=True)
-                
-                # 缓存结果
-                self.news_cache[cache_key] = (news_list, now)
-                print(f"📊 原始结果: {len(data['articles'])} 条 → 过滤后: {len(news_list)} 条 (第{page}页)")
-                return news_list
-                
-        except requests.exceptions.RequestException as e:
-            print(f"NewsAPI网络错误: {e}")
-            return []
-        except Exception as e:
-            print(f"NewsAPI其他错误: {e}")
-            return []
+        # 请求的页超出本地库时向上游补拉更早的一批
+        if page * per_page > len(self.news_store) and self.news_backfill_page is not None:
+            self.flight.do("news_backfill", self.backfill_news)
         
-        # 如果没有获取到新闻，提供友好的提示信息
-        print("⚠️ 当前未获取到新闻数据，可能是API限制或搜索条件过窄")
-        return []
-
-
+        return self.present_articles(self.news_store.page(page, per_page))
+    
+    def get_news_before(self, cursor=None, limit=10):
+        """游标分页，返回 (新闻, 下一页游标)；没有更多时游标为 None"""
+        key = decode_cursor(cursor) if cursor else None
+        if not self.news_is_fresh():
+            self.flight.do("news_ingest", self.refresh_news)
+        articles, has_more = self.news_store.before(key, limit)
+        if not has_more and self.news_backfill_page is not None:
+            # 翻到本地库末尾时向上游补拉更早的一批
+            if self.flight.do("news_backfill", self.backfill_news):
+                articles, has_more = self.news_store.before(key, limit)
+        next_cursor = encode_cursor(articles[-1]) if has_more and articles else None
+        return self.present_articles(articles), next_cursor
     
+    def get_symbol_news(self, symbol, page=1, per_page=10):
+        """某只股票的相关新闻，自选股变化后先重建标注"""
+        if self.news_tagged_version != self.watchlist.version:
+            self.news_tagged_version = self.watchlist.version
+            self.news_store.retag(self.watchlist.symbols)
+        if not self.news_is_fresh():
+            self.flight.do("news_ingest", self.refresh_news)
+        return self.present_articles(self.news_store.symbol_feed(symbol, page, per_page))
     
+    def get_symbol_sentiment(self, symbol, window=50):
+        """某只股票最近 window 条新闻的情绪汇总"""
+        return summarize(self.news_store.symbol_feed(symbol, 1, window))
+    
+    def present_articles(self, articles):
+        """补充随当前日期变化的字段，整页新闻一次算出日期分组"""
+        groups = date_groups([a['timestamp'] for a in articles], self.beijing_tz)
+        return [dict(article, date_group=group) for article, group in zip(articles, groups)]
+    
+    def refresh_news(self):
+        """并发拉取各提供方的最新一批新闻写入本地库"""
+        # 预热未完成时先读回本地库，避免把已有的新闻再向上游拉一遍
+        self.load_persistent_news()
+        now = datetime.now(self.beijing_tz)
+        if self.news_is_fresh(now):
+            return 0
+        articles, status = self.news_aggregator.fetch(now, batch_size=self.news_batch_size)
+        if status and all(s == 'quota' for s in status.values()):
+            # 额度紧张：继续使用本地新闻库，等到有额度时再检查
+            wait = min(self.news_quota.budget(name).seconds_until_available() for name in status)
+            self.news_checked_at = now - timedelta(seconds=max(self.news_ingest_interval - wait, 0))
+            print(f"⏳ 新闻接口额度紧张，{int(wait)}秒内使用本地新闻")
+            return 0
+        if 'ok' not in status.values():
+            # 失败时提前重试，但不占满额度
+            self.news_checked_at = now - timedelta(seconds=self.news_ingest_interval - self.news_retry_interval)
+            return 0
+        self.news_checked_at = now
+        if self.news_backfill_page is None:
+            # 上游匹配总数可能增加，允许再次补拉
+            self.news_backfill_page = 2
+        return self.ingest_articles(articles, now)
+    
+    def backfill_news(self):
+        """按页向前补拉更早的新闻（只有 NewsAPI 支持翻页），上游没有更多时停止"""
+        page = self.news_backfill_page
+        newsapi = self.news_aggregator.providers.get('newsapi')
+        if page is None or newsapi is None or newsapi.total_results is None:
+            return 0
+        if (page - 1) * self.news_batch_size >= newsapi.total_results or \
+                (newsapi.max_page is not None and page > newsapi.max_page):
+            # 上游没有更多，或账户只允许翻到 max_page（免费版翻页返回 426，之后一直如此）
+            self.news_backfill_page = None
+            return 0
+        # 补拉只使用富余额度，保证第一页刷新
+        now = datetime.now(self.beijing_tz)
+        articles, status = self.news_aggregator.fetch(
+            now, page, self.news_batch_size, PRIORITY_BACKFILL, names=['newsapi'])
+        if status.get('newsapi') == 'quota':
+            return 0
+        if status.get('newsapi') == 'limit':
+            self.news_backfill_page = None
+            return 0
+        added = self.ingest_articles(articles, now)
+        self.news_backfill_page = page + 1 if added else None
+        return added
+    
+    def ingest_articles(self, articles, now):
+        """打情绪分后写入本地库并持久化，返回新增条数"""
+        self.sentiment.score_batch(articles)
+        added = self.news_store.ingest(articles, now)
+        if added:
+            self.persistent.save_news_articles(added, now, self.news_store.max_articles)
+        print(f"📊 入库 {len(added)}/{len(articles)} 条新闻，本地共 {len(self.news_store)} 条")
+        return len(added)
 
 
 stock_data = StockData()
+price_events = PriceEventLog()
+stock_data.add_listener(price_events.publish)
+ws_hub = SubscriptionHub()
+stock_data.add_listener(ws_hub.dispatch)
+snapshots = SnapshotPublisher()
+refresher = RefreshScheduler(stock_data)
+# 多 worker 部署时只有一个进程刷新行情，其余进程从共享内存读取
+shared_quotes = SharedQuoteSync(stock_data, refresher)
+stock_data.add_listener(shared_quotes.publish)
+atexit.register(shared_quotes.stop)
+atexit.register(stock_data.upstream.close)
+
+@app.before_request
+def ensure_background_refresh():
+    """由 WSGI 服务器导入时没有启动入口，在第一个请求时启动后台线程；
+    预先 fork 的 worker 各自启动自己的线程（fork 前启动的线程不会被继承）
+    """
+    start_background()
+
+def start_background():
+    """启动后台刷新（写进程）或共享行情跟随（读进程），以及新闻库预热（重复调用无副作用）"""
+    shared_quotes.start()
+    stock_data.start_warm_up()
 
 @app.route('/')
 def index():
@@ -302,21 +476,207 @@ def index():
         "message": "股票监控系统API",
         "endpoints": {
             "/api/prices": "获取实时股价",
+            "/api/stream": "SSE实时股价推送",
+            "/api/ws": "WebSocket按股票订阅推送",
             "/api/news": "获取股票新闻",
-            "/api/trump-news": "获取特朗普相关新闻"
+            "/api/news/search?q=": "本地新闻全文检索",
+            "/api/news/<symbol>": "某只股票的相关新闻",
+            "/api/trump-news": "获取特朗普相关新闻",
+            "/api/quota": "新闻接口当日额度用量",
+            "/api/health": "存活检查",
+            "/api/ready": "就绪检查（预热完成前返回503）"
         }
     })
 
+def requested_symbols():
+    """解析 ?symbols=TSLA,COIN，并标记这些股票有人在看；未指定时返回整个列表"""
+    raw = request.args.get('symbols')
+    if not raw:
+        return stock_data.watchlist.symbols
+    symbols = [s.strip().upper() for s in raw.split(',') if s.strip()]
+    symbols = [s for s in symbols if s in stock_data.watchlist]
+    stock_data.watchlist.touch(symbols)
+    return symbols
+
+def prices_etag(endpoint, query=b''):
+    """股价类接口的 ETag：写进程的快照版本 + 自选股内容 + 查询参数，与处理请求的 worker 无关"""
+    return make_etag(endpoint, stock_data.snapshot_epoch, stock_data.prices_version,
+                     stock_data.watchlist.fingerprint, query)
+
+def build_prices_payload(symbols):
+    return {
+        "prices": {s: stock_data.prices[s] for s in symbols if s in stock_data.prices},
+        "last_update": {s: stock_data.last_update[s] for s in symbols if s in stock_data.last_update},
+        "timestamp": stock_data.prices_modified.isoformat()
+    }
+
+def build_all_data_payload(symbols):
+    return {
+        "prices": {s: stock_data.get_price_change(s) for s in symbols},
+        "last_update": {s: stock_data.last_update[s] for s in symbols if s in stock_data.last_update},
+        "timestamp": stock_data.prices_modified.isoformat()
+    }
+
+PRICE_PAYLOADS = {
+    'prices': build_prices_payload,
+    'all-data': build_all_data_payload,
+}
+
+def publish_price_snapshots(changes=None):
+    """刷新后立即为不带过滤参数的请求生成快照"""
+    for endpoint, build in PRICE_PAYLOADS.items():
+        snapshots.get_or_build(
+            endpoint,
+            prices_etag(endpoint),
+            lambda build=build: build(stock_data.watchlist.symbols),
+            stock_data.prices_modified
+        )
+
+stock_data.add_listener(publish_price_snapshots)
+
+def serve_prices(endpoint):
+    """股价类接口：304 > 预生成快照 > 按过滤参数即时生成"""
+    etag = prices_etag(endpoint, request.query_string)
+    modified = stock_data.prices_modified
+    symbols = requested_symbols()
+    cached = not_modified(etag, modified)
+    if cached is not None:
+        return cached
+    
+    build = PRICE_PAYLOADS[endpoint]
+    if request.args.get('symbols'):
+        return with_validators(jsonify(build(symbols)), etag, modified)
+    return snapshots.get_or_build(endpoint, etag, lambda: build(symbols), modified).response()
+
 @app.route('/api/prices')
 def get_prices():
     """获取实时股价"""
-    stock_data.update_prices()
+    return serve_prices('prices')
+
+@app.route('/api/stream')
+def stream_prices():
+    """SSE 股价推送：连接时发送快照，之后只推送变化，支持 Last-Event-ID 续传"""
+    symbols = requested_symbols()
+    filtered = bool(request.args.get('symbols'))
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    
+    def snapshot():
+        return {symbol: stock_data.get_price_change(symbol) for symbol in (symbols if filtered else stock_data.watchlist)}
+    
+    events = stream_events(
+        price_events,
+        snapshot,
+        last_event_id=last_event_id,
+        symbols=symbols if filtered else None,
+        on_heartbeat=(lambda: stock_data.watchlist.touch(symbols)) if filtered else None
+    )
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def handle_ws_message(session, message):
+    """处理客户端消息 {"action": "subscribe"|"unsubscribe", "symbols": [...]}，返回要回复的消息列表"""
+    try:
+        payload = json.loads(message)
+    except (TypeError, ValueError):
+        return [{"type": "error", "message": "无效的JSON"}]
+    if not isinstance(payload, dict):
+        return [{"type": "error", "message": "无效的JSON"}]
+    action = payload.get('action')
+    symbols = payload.get('symbols') or []
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    if not isinstance(symbols, list):
+        return [{"type": "error", "message": "symbols 必须是列表"}]
+    symbols = [str(s).strip().upper() for s in symbols]
+    if action == 'subscribe':
+        unknown = [s for s in symbols if s not in stock_data.watchlist]
+        added = ws_hub.subscribe(session, [s for s in symbols if s in stock_data.watchlist])
+        stock_data.watchlist.touch(added)
+        replies = [{"type": "subscribed", "symbols": added, "unknown": unknown}]
+        if added:
+            replies.append({"type": "snapshot", "prices": {s: stock_data.get_price_change(s) for s in added}})
+        return replies
+    if action == 'unsubscribe':
+        return [{"type": "unsubscribed", "symbols": ws_hub.unsubscribe(session, symbols)}]
+    return [{"type": "error", "message": f"未知操作: {action}"}]
+
+def serve_ws(ws, poll_interval=0.5, touch_interval=30):
+    """WebSocket 连接主循环：发送合并后的更新，处理订阅消息"""
+    session = ws_hub.register()
+    last_touch = time.monotonic()
+    try:
+        while True:
+            message = ws.receive(timeout=0)
+            while message is not None:
+                for reply in handle_ws_message(session, message):
+                    ws.send(json.dumps(reply, ensure_ascii=False))
+                message = ws.receive(timeout=0)
+            
+            batch = session.next_batch(poll_interval)
+            if batch is None:
+                ws.send(json.dumps({"type": "error", "message": session.close_reason or "连接已关闭"}))
+                break
+            if batch:
+                ws.send(json.dumps({"type": "prices", "prices": batch}, ensure_ascii=False))
+            
+            if time.monotonic() - last_touch > touch_interval:
+                stock_data.watchlist.touch(session.symbols)
+                last_touch = time.monotonic()
+    finally:
+        ws_hub.unregister(session)
+
+if Sock is not None:
+    sock = Sock(app)
+    
+    @sock.route('/api/ws')
+    def price_ws(ws):
+        """WebSocket 股价推送，按股票订阅"""
+        serve_ws(ws)
+
+@app.route('/api/watchlist', methods=['GET'])
+def get_watchlist():
+    """获取自选股列表"""
     return jsonify({
-        "prices": stock_data.prices,
-        "last_update": stock_data.last_update,
-        "timestamp": datetime.now().isoformat()
+        "symbols": stock_data.watchlist.symbols,
+        "count": len(stock_data.watchlist)
     })
 
+@app.route('/api/watchlist', methods=['POST'])
+def add_watchlist():
+    """加入自选股，请求体 {"symbols": ["AAPL", ...]}"""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "请求体必须是 JSON 对象"}), 400
+    symbols = payload.get('symbols') or []
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+        return jsonify({"error": "symbols 必须是股票代码字符串或字符串列表"}), 400
+    added, invalid, rejected = stock_data.watchlist.add(symbols)
+    if added:
+        # 新股票立即拉取，不等下一个刷新周期；写进程在其他 worker 时由共享同步线程唤醒
+        refresher.wake()
+    return jsonify({
+        "added": added,
+        "invalid": invalid,
+        "rejected": rejected,
+        "max_symbols": stock_data.watchlist.max_symbols,
+        "count": len(stock_data.watchlist)
+    }), 400 if (invalid or rejected) and not added else 200
+
+@app.route('/api/watchlist/<symbol>', methods=['DELETE'])
+def remove_watchlist(symbol):
+    """移除自选股"""
+    removed = stock_data.watchlist.remove([symbol])
+    stock_data.forget_symbols(removed)
+    return jsonify({
+        "removed": removed,
+        "count": len(stock_data.watchlist)
+    }), 200 if removed else 404
+
 @app.route('/api/news')
 def get_news():
     """获取股票新闻"""
@@ -336,37 +696,115 @@ def get_trump_news():
 @app.route('/api/all-data')
 def get_all_data():
     """获取所有数据"""
-    stock_data.update_prices()
-    
-    # 获取股价详细信息
-    prices_detail = {}
-    for symbol in WATCHLIST:
-        prices_detail[symbol] = stock_data.get_price_change(symbol)
-    
+    return serve_prices('all-data')
+
+@app.route('/api/health')
+def health():
+    """存活检查：进程能响应即可，不依赖预热"""
+    return jsonify({"status": "ok", "message": "股票监控系统运行正常"})
+
+@app.route('/api/ready')
+def ready():
+    """就绪检查：预热完成前返回503，负载均衡据此决定是否转发流量"""
+    state = stock_data.readiness()
+    return jsonify(state), 200 if state["ready"] else 503
+
+@app.route('/api/quota')
+def get_quota():
+    """已配置的各新闻提供方当日额度用量"""
     return jsonify({
-        "prices": prices_detail,
-        "last_update": stock_data.last_update,
-        "timestamp": datetime.now().isoformat()
+        "quota": stock_data.news_quota.status(stock_data.news_aggregator.providers),
+        "timestamp": datetime.now(stock_data.beijing_tz).isoformat()
+    })
+
+@app.route('/api/news/search')
+def search_news():
+    """在本地新闻库中全文检索，支持 AND / OR，不访问上游"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "缺少查询参数 q"}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    started = time.perf_counter()
+    news = stock_data.present_articles(stock_data.news_store.search(query, limit))
+    return jsonify({
+        "query": query,
+        "news": news,
+        "count": len(news),
+        "took_ms": round((time.perf_counter() - started) * 1000, 2)
+    })
+
+@app.route('/api/news/<symbol>')
+def get_symbol_news(symbol):
+    """获取某只自选股的相关新闻，支持 ?page= 分页"""
+    symbol = symbol.strip().upper()
+    if symbol not in stock_data.watchlist:
+        return jsonify({"error": f"{symbol} 不在自选股列表中"}), 404
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 10
+    news = stock_data.get_symbol_news(symbol, page, per_page)
+    return jsonify({
+        "symbol": symbol,
+        "news": news,
+        "sentiment": stock_data.get_symbol_sentiment(symbol),
+        "page": page,
+        "per_page": per_page,
+        "has_more": len(news) == per_page,
+        "timestamp": datetime.now(stock_data.beijing_tz).isoformat()
     })
 
 @app.route('/api/news/flat')
 @app.route('/api/news/flat/<int:page>')
-def get_flat_news(page=1):
-    """获取扁平化的新闻列表，支持分页"""
+def get_flat_news(page=None):
+    """获取扁平化的新闻列表：?cursor= 游标分页（推荐），或按页码分页"""
     per_page = 10
-    news = stock_data.get_all_news_flat(page, per_page)
+    if page is None:
+        try:
+            news, next_cursor = stock_data.get_news_before(request.args.get('cursor'), per_page)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({
+            "news": news,
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+            "timestamp": datetime.now(stock_data.beijing_tz).isoformat()
+        })
     
-    return jsonify({
+    version = stock_data.get_news_version(page, per_page)
+    if version is not None:
+        cached = not_modified(*version)
+        if cached is not None:
+            return cached
+    
+    if version is not None and news_page_in_store(page, per_page):
+        snapshot = snapshots.get(f"news-{page}", version[0])
+        if snapshot is not None:
+            return snapshot.response()
+    
+    news = stock_data.get_all_news_flat(page, per_page)
+    version = stock_data.get_news_version(page, per_page)
+    payload = {
         "news": news,
         "page": page,
         "per_page": per_page,
         "has_more": len(news) == per_page,
-        "timestamp": datetime.now().isoformat()
-    })
+        "timestamp": (version[1] if version else datetime.now(stock_data.beijing_tz)).isoformat()
+    }
+    # 只为库内的页保存快照；任意页码都建快照会让快照表随请求无限增长
+    if version is None or not news_page_in_store(page, per_page):
+        return jsonify(payload)
+    return snapshots.publish(f"news-{page}", payload, *version).response()
+
+def news_page_in_store(page, per_page):
+    """该页是否落在本地新闻库已有的文章范围内"""
+    return page >= 1 and (page - 1) * per_page < len(stock_data.news_store)
 
 if __name__ == '__main__':
     print("🚀 股票监控系统启动...")
-    print("📊 关注的股票:", WATCHLIST)
+    print("📊 关注的股票:", stock_data.watchlist.symbols)
     print("🌐 API地址: http://localhost:8090")
     print("📰 实时新闻API已启用")
+    # 调试模式的 reloader 父进程只监视文件变化，后台线程只在实际提供服务的子进程中启动
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background()
     app.run(debug=True, host='0.0.0.0', port=8090)
\ No newline at end of file
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+多进程共享的报价快照
+一个写进程负责刷新行情并写入 mmap 共享区，其余 worker 直接从共享区读取，不再各自请求上游。
+共享区采用 seqlock：写入前后各把序号加一，读者发现序号为奇数或前后不一致就重读。
+
+快照是一整块 JSON 而不是定长记录：读进程在序号变化时解析一次、合并到本地状态，
+请求只读本地状态，解析开销按行情变化次数而不是请求数计算（有 orjson 时用 orjson）。
+换来的是报价字段可以随意增减，不必维护二进制布局。
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+
+from persistent_cache import DEFAULT_PATH as CACHE_PATH
+from watchlist import DEFAULT_PATH as WATCHLIST_PATH
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时退回标准库
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台只有单进程，直接当写进程
+    fcntl = None
+
+MAGIC = b'STKQUOTE'
+HEADER = struct.Struct('<8sQQI')  # magic, seq, version, length
+HEADER_SIZE = 64
+
+DEFAULT_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def default_path():
+    """按本实例的缓存库和自选股文件位置生成共享区路径
+
+    同一主机上的多个部署（不同目录或不同 CACHE_DB）各用各的共享区和写锁，
+    同一部署的所有 worker 算出的路径相同
+    """
+    locations = [
+        os.path.abspath(os.environ.get('CACHE_DB', CACHE_PATH)),
+        os.path.abspath(os.environ.get('WATCHLIST_FILE', WATCHLIST_PATH)),
+    ]
+    digest = hashlib.sha1('\n'.join(locations).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(DEFAULT_DIR, f'stock-monitor-quotes-{digest}')
+
+
+class SharedQuoteArea:
+    """基于 mmap 文件的 seqlock 共享区"""
+
+    def __init__(self, path=None, size=16 * 1024 * 1024):
+        self.path = path or os.environ.get('SHARED_QUOTES_PATH') or default_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self.size = os.fstat(fd).st_size
+            self.mm = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+        self._write_lock = threading.Lock()
+
+    def _header(self):
+        magic, seq, version, length = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            return 0, 0, 0
+        return seq, version, length
+
+    def peek_seq(self):
+        """只读头部的序号，用于廉价地判断是否有新数据（跨写进程重启也单调递增）"""
+        return self._header()[0]
+
+    def write(self, payload, version):
+        """写入一份新快照（仅写进程调用）"""
+        if HEADER_SIZE + len(payload) > self.size:
+            print(f"共享快照过大 ({len(payload)} 字节)，超过共享区容量 {self.size}")
+            return False
+        with self._write_lock:
+            seq = self._header()[0]
+            if seq % 2:
+                seq += 1  # 上一个写进程在写入中途退出
+            HEADER.pack_into(self.mm, 0, MAGIC, seq + 1, version, 0)
+            self.mm[HEADER_SIZE:HEADER_SIZE + len(payload)] = payload
+            HEADER.pack_into(self.mm, 0, MAGIC, seq + 2, version, len(payload))
+        return True
+
+    def read(self, retries=100):
+        """读取一致的快照 (seq, payload)；没有数据时返回 None"""
+        for _ in range(retries):
+            seq, version, length = self._header()
+            if seq == 0:
+                return None
+            if seq % 2:
+                continue
+            payload = self.mm[HEADER_SIZE:HEADER_SIZE + length]
+            if self._header()[0] == seq:
+                return seq, payload
+        return None
+
+    def publish(self, snapshot, version):
+        if orjson is not None:
+            return self.write(orjson.dumps(snapshot), version)
+        return self.write(json.dumps(snapshot, separators=(',', ':')).encode('utf-8'), version)
+
+    def load(self):
+        data = self.read()
+        if data is None:
+            return None
+        seq, payload = data
+        return seq, orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+
+class WriterLease:
+    """用文件锁选出唯一的写进程；写进程退出后锁自动释放，其他进程可以接替"""
+
+    def __init__(self, path):
+        self.path = path
+        self.acquired = fcntl is None
+        self._fd = None
+
+    def try_acquire(self):
+        if self.acquired:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        self.acquired = True
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+            self.acquired = fcntl is None
+
+
+class SharedQuoteSync:
+    """写进程刷新并发布快照；读进程跟随共享区更新本地 StockData"""
+
+    def __init__(self, stock_data, refresher, area=None, lease=None, poll_interval=1.0):
+        self.stock_data = stock_data
+        self.refresher = refresher
+        self.area = area or SharedQuoteArea()
+        self.lease = lease or WriterLease(self.area.path + '.lock')
+        self.poll_interval = poll_interval
+        self.seen_seq = None
+        self.published_warm = False  # 预热完成后是否已发布过，读进程据此标记就绪
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_writer(self):
+        return self.lease.acquired
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='shared-quotes', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        self.refresher.stop(timeout)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.lease.release()
+
+    def publish(self, changes=None):
+        """写进程把当前全部报价写入共享区"""
+        if self.is_writer:
+            snapshot = self.stock_data.export_shared_quotes()
+            self.area.publish(snapshot, self.stock_data.prices_version)
+            self.published_warm = snapshot["warm"]
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                # 自选股可能由其他 worker 通过API修改过
+                if self.stock_data.watchlist.reload_if_changed():
+                    self.on_watchlist_changed()
+                if self.is_writer or self.lease.try_acquire():
+                    if not self.refresher.running:
+                        print(f"📝 进程 {os.getpid()} 成为行情写进程")
+                        self.publish()
+                        self.refresher.start()
+                    elif self.stock_data.prices_warm and not self.published_warm:
+                        # 首轮刷新的数据可能没有变化，不会触发发布
+                        self.publish()
+                else:
+                    self.follow()
+            except Exception as e:
+                print(f"同步共享行情失败: {e}")
+            self._stop_event.wait(self.poll_interval)
+
+    def on_watchlist_changed(self):
+        """其他 worker 修改了自选股：清理被移除股票的状态，写进程立即拉取新加入的股票"""
+        watchlist = self.stock_data.watchlist
+        tracked = set(self.stock_data.bar_store.history.index) | set(self.stock_data.cache)
+        removed = [s for s in tracked if s not in watchlist]
+        if removed:
+            self.stock_data.forget_symbols(removed)
+        if self.is_writer:
+            self.refresher.wake()
+
+    def follow(self):
+        """读进程：共享区版本变化时把报价合并到本地"""
+        if self.area.peek_seq() == self.seen_seq:
+            return
+        data = self.area.load()
+        if data is None:
+            return
+        self.seen_seq, snapshot = data
+        self.stock_data.apply_shared_quotes(snapshot)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+预序列化、预压缩的响应快照
+数据刷新时只序列化一次，同时生成 gzip / brotli 版本，请求时按 Accept-Encoding 直接写出字节
+"""
+
+import gzip
+import json
+import threading
+
+from flask import Response, request
+
+from http_cache import ENCODINGS, encoded_etag
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时退回标准库
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只提供 gzip
+    brotli = None
+
+
+def dumps(payload):
+    """序列化为 UTF-8 JSON 字节"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class Snapshot:
+    """一份已序列化的响应体及其压缩版本"""
+
+    def __init__(self, body, etag, last_modified=None, min_compress_size=512):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.encoded = {}
+        if len(body) >= min_compress_size:
+            self.encoded['gzip'] = gzip.compress(body, compresslevel=9)
+            if brotli is not None:
+                self.encoded['br'] = brotli.compress(body, quality=9)
+
+    def choose_encoding(self):
+        """按客户端 Accept-Encoding 选择最优编码，优先 brotli"""
+        accepted = request.accept_encodings
+        for encoding in ENCODINGS:
+            if encoding in self.encoded and accepted[encoding] > 0:
+                return encoding
+        return None
+
+    def response(self):
+        encoding = self.choose_encoding()
+        response = Response(self.encoded[encoding] if encoding else self.body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.set_etag(encoded_etag(self.etag, encoding))
+        if self.last_modified is not None:
+            response.last_modified = self.last_modified
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+class SnapshotPublisher:
+    """按键保存最新快照；版本（ETag）不变时直接复用"""
+
+    def __init__(self, min_compress_size=512):
+        self.min_compress_size = min_compress_size
+        self.snapshots = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, etag):
+        snapshot = self.snapshots.get(key)
+        if snapshot is not None and snapshot.etag == etag:
+            return snapshot
+        return None
+
+    def publish(self, key, payload, etag, last_modified=None):
+        """序列化并压缩一次，替换该键的快照"""
+        snapshot = Snapshot(dumps(payload), etag, last_modified, self.min_compress_size)
+        self.snapshots[key] = snapshot
+        return snapshot
+
+    def get_or_build(self, key, etag, build, last_modified=None):
+        """快照过期时调用 build() 重新生成，同一时刻只构建一次"""
+        snapshot = self.get(key, etag)
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            snapshot = self.get(key, etag)
+            if snapshot is None:
+                snapshot = self.publish(key, build(), etag, last_modified)
+        return snapshot
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+新闻股票标注
+用 Aho-Corasick 自动机一次扫描标题和摘要，同时匹配全部股票代码和公司别名，
+匹配耗时只与文本长度有关，不随自选股数量增长；并维护 股票 -> 新闻 的倒排表
+"""
+
+import bisect
+import threading
+from collections import deque
+
+# 代码之外的常用名称
+SYMBOL_ALIASES = {
+    'TSLA': ['Tesla', 'Elon Musk'],
+    'UBER': ['Uber'],
+    'COIN': ['Coinbase'],
+    'RDDT': ['Reddit'],
+    'CADL': ['Candel Therapeutics'],
+    'AAPL': ['Apple'],
+    'MSFT': ['Microsoft'],
+    'NVDA': ['Nvidia'],
+    'AMZN': ['Amazon'],
+    'GOOGL': ['Alphabet', 'Google'],
+    'META': ['Meta Platforms', 'Facebook'],
+}
+
+
+class AhoCorasick:
+    """多模式匹配自动机，模式为小写字符串"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for pattern, value in patterns:
+            self._insert(pattern, value)
+        self._build()
+
+    def _insert(self, pattern, value):
+        state = 0
+        for char in pattern:
+            nxt = self.goto[state].get(char)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][char] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = nxt
+        self.output[state].append((len(pattern), value))
+
+    def _build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(char, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def iter(self, text):
+        """产出 (起始位置, 结束位置, value)"""
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length, value in self.output[state]:
+                yield i - length + 1, i + 1, value
+
+
+def is_boundary(text, pos):
+    return pos < 0 or pos >= len(text) or not text[pos].isalnum()
+
+
+class SymbolTagger:
+    """给新闻标注相关股票，并按股票维护 (timestamp, url) 升序的倒排表"""
+
+    def __init__(self, aliases=None):
+        self.aliases = SYMBOL_ALIASES if aliases is None else aliases
+        self.symbols = ()
+        self.automaton = AhoCorasick([])
+        self._postings = {}  # symbol -> [(timestamp, url)]
+        self._lock = threading.Lock()
+
+    def build(self, symbols):
+        """按股票列表重建自动机并清空倒排表"""
+        patterns = []
+        for symbol in symbols:
+            # 代码区分大小写匹配，避免把普通单词 "coin" 当成 COIN；过短的代码只匹配 $X 形式
+            ticker = symbol if len(symbol) > 2 else f'${symbol}'
+            patterns.append((ticker.lower(), (symbol, ticker)))
+            patterns.append((f'${symbol}'.lower(), (symbol, None)))
+            for alias in self.aliases.get(symbol, ()):
+                patterns.append((alias.lower(), (symbol, None)))
+        with self._lock:
+            self.symbols = tuple(symbols)
+            self.automaton = AhoCorasick(patterns)
+            self._postings = {}
+
+    def tag(self, text):
+        """返回文本中提到的股票（按首次出现顺序）"""
+        lowered = text.lower()
+        found = {}
+        for start, end, (symbol, exact) in self.automaton.iter(lowered):
+            if symbol in found:
+                continue
+            if not (is_boundary(lowered, start - 1) and is_boundary(lowered, end)):
+                continue
+            if exact is not None and text[start:end] != exact:
+                continue
+            found[symbol] = start
+        return list(found)
+
+    def add(self, article):
+        """标注并登记一篇新闻，结果写入 article['symbols']"""
+        symbols = self.tag(f"{article.get('title', '')}\n{article.get('summary', '')}")
+        article['symbols'] = symbols
+        key = (article['timestamp'], article['url'])
+        with self._lock:
+            for symbol in symbols:
+                bisect.insort(self._postings.setdefault(symbol, []), key)
+
+    def remove(self, article):
+        key = (article['timestamp'], article['url'])
+        with self._lock:
+            for symbol in article.get('symbols', ()):
+                postings = self._postings.get(symbol)
+                if not postings:
+                    continue
+                pos = bisect.bisect_left(postings, key)
+                if pos < len(postings) and postings[pos] == key:
+                    del postings[pos]
+
+    def feed(self, symbol, page=1, per_page=10):
+        """某只股票第 page 页新闻的 (timestamp, url)，按时间倒序"""
+        with self._lock:
+            postings = self._postings.get(symbol, [])
+            end = len(postings) - (page - 1) * per_page
+            if end <= 0:
+                return []
+            return list(reversed(postings[max(end - per_page, 0):end]))
+
+    def count(self, symbol):
+        return len(self._postings.get(symbol, ()))
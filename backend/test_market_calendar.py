@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+交易时段日历测试：节假日、提前收盘、9:30 换日，时间通过注入的 clock 控制
+运行：cd backend && python -m pytest -q test_market_calendar.py
+"""
+
+from datetime import date, datetime
+
+from market_calendar import (
+    AFTER_HOURS, CLOSED, EXCHANGE_TZ, PRE_MARKET, REGULAR,
+    MarketCalendar, nyse_early_closes, nyse_holidays
+)
+
+
+def at(year, month, day, hour=0, minute=0):
+    """纽约时间"""
+    return EXCHANGE_TZ.localize(datetime(year, month, day, hour, minute))
+
+
+def calendar_at(*args):
+    moment = at(*args)
+    return MarketCalendar(clock=lambda: moment)
+
+
+def test_holidays():
+    holidays = nyse_holidays(2026)
+    assert date(2026, 4, 3) in holidays  # 耶稣受难日
+    assert date(2026, 7, 3) in holidays  # 独立日在周六，提前到周五
+    assert date(2026, 11, 26) in holidays  # 感恩节
+    assert date(2026, 6, 19) in holidays  # 六月节
+    # 元旦落在周六时不提前到上一年
+    assert date(2021, 12, 31) not in nyse_holidays(2021) | nyse_holidays(2022)
+    assert not MarketCalendar().is_trading_day(date(2026, 12, 25))
+
+
+def test_early_closes():
+    early = nyse_early_closes(2026)
+    assert date(2026, 11, 27) in early  # 感恩节次日
+    assert date(2026, 12, 24) in early
+    assert date(2026, 7, 3) not in early  # 当天已是节假日
+    assert calendar_at(2026, 11, 27, 12, 59).session() == REGULAR
+    assert calendar_at(2026, 11, 27, 13, 0).session() == AFTER_HOURS
+
+
+def test_sessions_and_refresh_intervals():
+    assert calendar_at(2026, 10, 16, 8, 0).session() == PRE_MARKET
+    assert calendar_at(2026, 10, 16, 10, 0).session() == REGULAR
+    assert calendar_at(2026, 10, 16, 17, 0).session() == AFTER_HOURS
+    assert calendar_at(2026, 10, 17, 10, 0).session() == CLOSED  # 周六
+    assert calendar_at(2026, 10, 16, 10, 0).refresh_interval() == 15
+    # 分钟线不含盘前盘后，这些时段不刷新
+    assert calendar_at(2026, 10, 16, 8, 0).refresh_interval() is None
+    assert calendar_at(2026, 10, 16, 17, 0).refresh_interval() is None
+
+
+def test_session_date_rolls_over_at_open():
+    assert calendar_at(2026, 10, 16, 9, 29).last_session_date() == date(2026, 10, 15)
+    assert calendar_at(2026, 10, 16, 9, 30).last_session_date() == date(2026, 10, 16)
+    # 周一开盘前仍是上周五，节假日后跳过节假日
+    assert calendar_at(2026, 10, 19, 8, 0).last_session_date() == date(2026, 10, 16)
+    assert calendar_at(2026, 11, 27, 9, 0).last_session_date() == date(2026, 11, 25)
+
+
+def test_cache_freshness_uses_regular_close():
+    calendar = calendar_at(2026, 11, 27, 15, 0)  # 提前收盘日的盘后
+    assert calendar.last_session_end() == at(2026, 11, 27, 13, 0)
+    assert calendar.is_fresh(at(2026, 11, 27, 13, 5))
+    assert not calendar.is_fresh(at(2026, 11, 27, 12, 55))
+    # 周末睡到周一开盘（不超过 max_sleep）
+    weekend = calendar_at(2026, 10, 18, 12, 0)
+    assert weekend.next_session_start() == at(2026, 10, 19, 9, 30)
+    assert weekend.seconds_until_refresh(max_sleep=10 ** 6) == 21.5 * 3600
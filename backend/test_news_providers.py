@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+多新闻源聚合测试：各提供方由本地桩服务器模拟，不访问外网
+运行：cd backend && python -m pytest -q test_news_providers.py
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytz
+
+from news_providers import CurrentsProvider, NewsAggregator, NewsAPIProvider
+from quota import QuotaBudgeter
+from upstream import UpstreamClient
+
+TZ = pytz.timezone('Asia/Shanghai')
+
+
+@contextmanager
+def stub_server(routes):
+    """routes: {路径: (状态码, JSON内容, 延迟秒数)}；返回 (基础地址, 各路径的请求次数)"""
+    hits = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            hits[path] = hits.get(path, 0) + 1
+            status, body, delay = routes[path]
+            time.sleep(delay)
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", hits
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextmanager
+def aggregator(*providers):
+    client = UpstreamClient(backoff=0.01)
+    try:
+        yield NewsAggregator(client, providers, QuotaBudgeter(), TZ)
+    finally:
+        client.close()
+
+
+def newsapi_body(*articles):
+    return {'status': 'ok', 'totalResults': len(articles), 'articles': list(articles)}
+
+
+NOW = datetime(2026, 10, 18, 4, 0, tzinfo=timezone.utc)
+
+
+def test_merges_providers_by_time():
+    routes = {
+        '/newsapi': (200, newsapi_body(
+            {'title': 'Tesla beats', 'url': 'http://a/1', 'source': {'name': 'A'},
+             'publishedAt': '2026-10-18T03:00:00Z'},
+            {'title': '[Removed]', 'url': 'http://a/2', 'publishedAt': '2026-10-18T03:30:00Z'},
+        ), 0),
+        '/currents': (200, {'status': 'ok', 'news': [
+            {'title': 'Uber falls', 'url': 'http://c/1', 'author': 'C', 'published': '2026-10-18 03:10:00 +0000'},
+        ]}, 0),
+    }
+    with stub_server(routes) as (base, hits):
+        providers = [NewsAPIProvider('k', url=base + '/newsapi'), CurrentsProvider('k', url=base + '/currents')]
+        with aggregator(*providers) as agg:
+            articles, status = agg.fetch(NOW)
+    assert status == {'newsapi': 'ok', 'currents': 'ok'}
+    assert [a['url'] for a in articles] == ['http://c/1', 'http://a/1']
+    assert articles[0]['beijing_time'] == '10-18 11:10'
+
+
+def test_slow_provider_is_skipped_at_deadline():
+    routes = {
+        '/fast': (200, newsapi_body({'title': 'Fast', 'url': 'http://f/1', 'publishedAt': '2026-10-18T03:00:00Z'}), 0),
+        '/slow': (200, {'status': 'ok', 'news': []}, 2),
+    }
+    with stub_server(routes) as (base, hits):
+        slow = CurrentsProvider('k', url=base + '/slow', timeout=0.3)
+        with aggregator(NewsAPIProvider('k', url=base + '/fast'), slow) as agg:
+            started = time.monotonic()
+            articles, status = agg.fetch(NOW)
+            elapsed = time.monotonic() - started
+    assert status == {'newsapi': 'ok', 'currents': 'timeout'}
+    assert len(articles) == 1
+    assert elapsed < 1.5
+
+
+def test_rate_limit_body_on_http_error_exhausts_quota():
+    routes = {'/newsapi': (429, {'status': 'error', 'code': 'rateLimited', 'message': 'too many'}, 0)}
+    with stub_server(routes) as (base, hits):
+        with aggregator(NewsAPIProvider('k', url=base + '/newsapi')) as agg:
+            _, status = agg.fetch(NOW)
+            assert status == {'newsapi': 'error'}
+            budget = agg.quota.budget('newsapi')
+            assert budget.used() == budget.daily_limit
+            # 当天不再请求上游
+            _, status = agg.fetch(NOW)
+    assert status == {'newsapi': 'quota'}
+    assert hits == {'/newsapi': 1}
+
+
+def test_page_limit_stops_backfill():
+    routes = {'/newsapi': (426, {'status': 'error', 'code': 'maximumResultsReached', 'message': 'upgrade'}, 0)}
+    with stub_server(routes) as (base, hits):
+        provider = NewsAPIProvider('k', url=base + '/newsapi')
+        with aggregator(provider) as agg:
+            _, status = agg.fetch(NOW, page=2)
+            used = agg.quota.budget('newsapi').used()
+    assert status == {'newsapi': 'limit'}
+    assert provider.max_page == 1
+    assert used == 1  # 页号超限不是限流，不会把当天额度清空
+
+
+def test_server_errors_are_not_retried():
+    # 每次请求都消耗额度，失败时不自动重试
+    routes = {'/newsapi': (503, {'status': 'error'}, 0)}
+    with stub_server(routes) as (base, hits):
+        with aggregator(NewsAPIProvider('k', url=base + '/newsapi')) as agg:
+            _, status = agg.fetch(NOW)
+    assert status == {'newsapi': 'error'}
+    assert hits == {'/newsapi': 1}
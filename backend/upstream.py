@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+异步上游客户端
+在后台事件循环中复用一个 aiohttp 连接池（keep-alive），限制每个主机的并发数，
+统一处理超时和重试；Flask 线程通过同步包装调用，多个请求可以并发执行
+"""
+
+import asyncio
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+# 这些状态码视为临时错误，可以重试；429 是额度限流，重试只会继续浪费额度
+RETRY_STATUS = {500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """上游请求最终失败（重试用尽或不可重试的错误）
+
+    data 为错误响应的JSON内容（能解析时），调用方据此区分限流、额度等错误码
+    """
+
+    def __init__(self, message, status=None, data=None):
+        super().__init__(message)
+        self.status = status
+        self.data = data
+
+
+class UpstreamClient:
+    """带连接池的异步HTTP客户端，事件循环运行在独立的守护线程中"""
+
+    def __init__(self, limit=64, limit_per_host=8, timeout=5, retries=2, backoff=0.3, max_workers=8):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        # 阻塞型调用（如 yfinance）放到线程池里并发执行
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upstream')
+        self.loop = None
+        self.session = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self.loop is None or self.loop.is_closed():
+                self.loop = asyncio.new_event_loop()
+                self.loop.set_default_executor(self.executor)
+                self._thread = threading.Thread(target=self.loop.run_forever, name='upstream-loop', daemon=True)
+                self._thread.start()
+        return self.loop
+
+    async def _session(self):
+        # 会话必须在事件循环线程内创建，且只创建一次
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300,
+                keepalive_timeout=30
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'User-Agent': 'stock-monitor/1.0'}
+            )
+        return self.session
+
+    def run(self, coro, timeout=None):
+        """在后台事件循环中执行协程并等待结果"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return future.result(timeout)
+
+    async def get_json(self, url, params=None, headers=None, retries=None):
+        """GET 并解析JSON；连接错误、超时和 5xx 按指数退避重试
+
+        retries 为 None 时使用客户端默认值；按次计费的接口传 0，一次额度只对应一次请求
+        """
+        session = await self._session()
+        last_error = None
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+            try:
+                async with session.get(url, params=params, headers=headers) as response:
+                    if response.status in RETRY_STATUS:
+                        last_error = UpstreamError(f"HTTP {response.status}: {url}", response.status)
+                        continue
+                    if response.status >= 400:
+                        try:
+                            data = await response.json(content_type=None)
+                        except (ValueError, aiohttp.ClientError):
+                            data = None
+                        raise UpstreamError(f"HTTP {response.status}: {url}", response.status, data)
+                    return await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = UpstreamError(f"请求失败: {url}: {e!r}")
+        raise last_error
+
+    def map_blocking(self, fn, items):
+        """在线程池中并发执行阻塞函数，结果按顺序返回，异常作为结果返回"""
+        async def gather():
+            loop = asyncio.get_running_loop()
+            return await asyncio.gather(
+                *(loop.run_in_executor(None, fn, item) for item in items),
+                return_exceptions=True
+            )
+        items = list(items)
+        if len(items) <= 1:
+            # 单个任务直接在当前线程执行，省去一次线程切换
+            results = []
+            for item in items:
+                try:
+                    results.append(fn(item))
+                except Exception as e:
+                    results.append(e)
+            return results
+        return self.run(gather())
+
+    def close(self):
+        if self.loop is None or self.loop.is_closed():
+            return
+        if self.session is not None:
+            try:
+                self.run(self.session.close(), timeout=5)
+            except Exception as e:
+                print(f"关闭上游连接池失败: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if self._thread is not None:
+            self._thread.join(5)
+        self.loop.close()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+运行时自选股列表
+支持通过API增删并持久化到本地文件，按优先级切分成批次供后台刷新
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+DEFAULT_WATCHLIST = ['RDDT', 'TSLA', 'UBER', 'COIN', 'CADL']
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'watchlist.json')
+
+# 自选股数量上限，后台每轮都要刷新全部股票，避免被无限加入拖垮刷新周期
+MAX_SYMBOLS = int(os.environ.get('WATCHLIST_MAX_SYMBOLS', 5000))
+
+SYMBOL_PATTERN = re.compile(r'^[A-Z0-9][A-Z0-9.\-=^]{0,14}$')
+
+
+def normalize_symbol(symbol):
+    """统一为大写代码，不合法时返回 None"""
+    symbol = str(symbol or '').strip().upper()
+    return symbol if SYMBOL_PATTERN.match(symbol) else None
+
+
+class Watchlist:
+    """线程安全的自选股列表"""
+
+    def __init__(self, path=None, default=None, active_window=120, max_symbols=MAX_SYMBOLS):
+        self.path = path or os.environ.get('WATCHLIST_FILE', DEFAULT_PATH)
+        self.max_symbols = max_symbols
+        self.active_window = active_window  # 最近多少秒内有人查看算作活跃
+        self._symbols = {}  # symbol -> 加入时间，保持加入顺序
+        self._viewed = {}  # symbol -> 最近一次被查看的时间
+        self.version = 0  # 每次增删加一（本进程内）
+        self._fingerprint = None  # (version, 列表内容的哈希)
+        self._mtime = None  # 最近一次读写时文件的修改时间
+        self._lock = threading.Lock()
+        self._load(DEFAULT_WATCHLIST if default is None else default)
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self, default):
+        symbols = default
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    symbols = json.load(f).get('symbols', default)
+                self._mtime = self._file_mtime()
+            except (OSError, ValueError) as e:
+                print(f"读取自选股文件失败，使用默认列表: {e}")
+        now = time.time()
+        for symbol in symbols:
+            symbol = normalize_symbol(symbol)
+            if symbol:
+                self._symbols.setdefault(symbol, now)
+
+    def reload_if_changed(self):
+        """文件被其他进程修改时重新读取，返回是否有变化"""
+        mtime = self._file_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                symbols = [s for s in map(normalize_symbol, json.load(f).get('symbols', [])) if s]
+        except (OSError, ValueError) as e:
+            print(f"读取自选股文件失败: {e}")
+            return False
+        with self._lock:
+            self._mtime = mtime
+            if symbols == list(self._symbols):
+                return False
+            now = time.time()
+            self._symbols = {s: self._symbols.get(s, now) for s in symbols}
+            self._viewed = {s: t for s, t in self._viewed.items() if s in self._symbols}
+            self.version += 1
+        return True
+
+    def _save(self):
+        """原子写入，避免进程中断时文件损坏"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'symbols': list(self._symbols)}, f)
+            os.replace(tmp_path, self.path)
+            self._mtime = self._file_mtime()
+        except OSError as e:
+            print(f"保存自选股文件失败: {e}")
+
+    @property
+    def symbols(self):
+        with self._lock:
+            return list(self._symbols)
+
+    @property
+    def fingerprint(self):
+        """列表内容的哈希：各 worker 的 version 各自计数，内容相同时指纹相同，用于生成 ETag"""
+        cached = self._fingerprint
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        with self._lock:
+            version = self.version
+            digest = hashlib.sha1(','.join(self._symbols).encode('utf-8')).hexdigest()[:16]
+        self._fingerprint = (version, digest)
+        return digest
+
+    def __iter__(self):
+        return iter(self.symbols)
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._symbols
+
+    def add(self, symbols):
+        """加入股票，返回 (新加入的, 不合法的, 超出数量上限未加入的)"""
+        added, invalid, rejected = [], [], []
+        with self._lock:
+            now = time.time()
+            for raw in symbols:
+                symbol = normalize_symbol(raw)
+                if symbol is None:
+                    invalid.append(raw)
+                elif symbol in self._symbols:
+                    continue
+                elif len(self._symbols) >= self.max_symbols:
+                    rejected.append(symbol)
+                else:
+                    self._symbols[symbol] = now
+                    added.append(symbol)
+            if added:
+                self.version += 1
+                self._save()
+        return added, invalid, rejected
+
+    def remove(self, symbols):
+        """移除股票，返回实际移除的列表"""
+        removed = []
+        with self._lock:
+            for raw in symbols:
+                symbol = normalize_symbol(raw)
+                if symbol in self._symbols:
+                    del self._symbols[symbol]
+                    self._viewed.pop(symbol, None)
+                    removed.append(symbol)
+            if removed:
+                self.version += 1
+                self._save()
+        return removed
+
+    def touch(self, symbols):
+        """记录这些股票正被客户端查看"""
+        now = time.time()
+        with self._lock:
+            for symbol in symbols:
+                if symbol in self._symbols:
+                    self._viewed[symbol] = now
+
+    def prioritized(self, has_data=None):
+        """按优先级排序：有人查看的 > 尚无数据的 > 其余按加入顺序"""
+        now = time.time()
+        with self._lock:
+            symbols = list(self._symbols)
+            viewed = dict(self._viewed)
+        active = sorted(
+            (s for s in symbols if now - viewed.get(s, 0) < self.active_window),
+            key=lambda s: -viewed[s]
+        )
+        active_set = set(active)
+        rest = [s for s in symbols if s not in active_set]
+        if has_data is not None:
+            rest = [s for s in rest if not has_data(s)] + [s for s in rest if has_data(s)]
+        return active + rest
+
+    def shards(self, batch_size, has_data=None):
+        """按优先级切分成批次"""
+        ordered = self.prioritized(has_data)
+        return [ordered[i:i + batch_size] for i in range(0, len(ordered), batch_size)]
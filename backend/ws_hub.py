@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+WebSocket 订阅分发中心
+客户端按股票订阅，按股票建立订阅索引，一次行情变化只分发给订阅了该股票的客户端；
+每个客户端的待发送数据按股票合并，慢客户端超时后断开，内存不会无限增长
+"""
+
+import itertools
+import threading
+import time
+from collections import defaultdict
+
+
+class ClientSession:
+    """一个客户端连接：订阅集合和按股票合并后的待发送更新"""
+
+    def __init__(self, client_id, max_lag=30):
+        self.client_id = client_id
+        self.symbols = set()
+        self.max_lag = max_lag  # 待发送数据超过这么多秒没有被取走就断开
+        self.pending = {}
+        self.closed = False
+        self.close_reason = None
+        self.last_drain = time.monotonic()
+        self._cond = threading.Condition()
+
+    def offer(self, symbol, quote):
+        """加入一条更新；同一股票未发送的旧值直接被覆盖"""
+        with self._cond:
+            if self.closed:
+                return False
+            if self.pending and time.monotonic() - self.last_drain > self.max_lag:
+                self._close('slow consumer')
+                return False
+            self.pending[symbol] = quote
+            self._cond.notify()
+            return True
+
+    def next_batch(self, timeout):
+        """取走全部待发送更新；超时返回空字典，已关闭返回 None"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.pending or self.closed, timeout)
+            if self.closed:
+                return None
+            batch, self.pending = self.pending, {}
+            self.last_drain = time.monotonic()
+            return batch
+
+    def close(self, reason=None):
+        with self._cond:
+            self._close(reason)
+
+    def _close(self, reason):
+        if not self.closed:
+            self.closed = True
+            self.close_reason = reason
+            self.pending = {}
+            self._cond.notify_all()
+
+
+class SubscriptionHub:
+    """按股票索引订阅者，分发代价只与该股票的订阅者数量有关"""
+
+    def __init__(self, max_lag=30):
+        self.max_lag = max_lag
+        self.sessions = {}
+        self.index = defaultdict(set)  # symbol -> {ClientSession}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def register(self):
+        session = ClientSession(next(self._ids), self.max_lag)
+        with self._lock:
+            self.sessions[session.client_id] = session
+        return session
+
+    def unregister(self, session):
+        session.close()
+        with self._lock:
+            self.sessions.pop(session.client_id, None)
+            for symbol in session.symbols:
+                self._discard(symbol, session)
+            session.symbols = set()
+
+    def subscribe(self, session, symbols):
+        """订阅股票，返回本次新增的订阅"""
+        added = []
+        with self._lock:
+            for symbol in symbols:
+                if symbol not in session.symbols:
+                    session.symbols.add(symbol)
+                    self.index[symbol].add(session)
+                    added.append(symbol)
+        return added
+
+    def unsubscribe(self, session, symbols):
+        removed = []
+        with self._lock:
+            for symbol in symbols:
+                if symbol in session.symbols:
+                    session.symbols.discard(symbol)
+                    self._discard(symbol, session)
+                    removed.append(symbol)
+        return removed
+
+    def _discard(self, symbol, session):
+        subscribers = self.index.get(symbol)
+        if subscribers is not None:
+            subscribers.discard(session)
+            if not subscribers:
+                del self.index[symbol]
+
+    def dispatch(self, changes):
+        """把 {symbol: quote} 分发给对应订阅者，断开被判定为慢消费者的连接"""
+        dropped = []
+        with self._lock:
+            targets = [(symbol, quote, list(self.index.get(symbol, ())))
+                       for symbol, quote in changes.items() if symbol in self.index]
+        for symbol, quote, subscribers in targets:
+            for session in subscribers:
+                if not session.offer(symbol, quote) and session.closed:
+                    dropped.append(session)
+        for session in set(dropped):
+            self.unregister(session)
+
+    def subscribed_symbols(self):
+        with self._lock:
+            return list(self.index)
@@ -2,6 +2,7 @@
 class SimpleNewsStream {
     constructor() {
         this.currentPage = 1;
+        this.cursor = null; // 下一页游标，由服务端返回
         this.isLoading = false;
         this.hasMore = true;
         this.newsContainer = null;
@@ -40,11 +41,14 @@ class SimpleNewsStream {
         try {
             if (reset) {
                 this.currentPage = 1;
+                this.cursor = null;
                 this.hasMore = true;
             }
             
             const baseUrl = 'http://localhost:5000';
-            const response = await fetch(`${baseUrl}/api/news/flat/${this.currentPage}`);
+            // 游标分页：新新闻入库时已加载的页不会错位或重复
+            const query = this.cursor ? `?cursor=${encodeURIComponent(this.cursor)}` : '';
+            const response = await fetch(`${baseUrl}/api/news/flat${query}`);
             const data = await response.json();
             
             const news = data.news || [];
@@ -66,7 +70,8 @@ class SimpleNewsStream {
                 });
                 
                 // 检查是否还有更多内容
-                this.hasMore = news.length === 10; // 假设API返回10条为满页
+                this.cursor = data.next_cursor || null;
+                this.hasMore = Boolean(data.has_more && this.cursor);
                 
                 console.log(`📰 已加载第${this.currentPage}页，${news.length}条新闻`);
             }
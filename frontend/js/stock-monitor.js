@@ -4,15 +4,40 @@ class StockMonitor {
         this.apiBase = 'http://localhost:5000/api';
         this.updateInterval = 60000; // 60秒更新一次
         this.updateTimer = null;
+        this.priceStream = null;
+        this.streamPrices = {};
         this.init();
     }
 
     init() {
         this.bindEvents();
+        this.startPriceStream();
         this.loadAllData(false);
         this.startAutoUpdate();
     }
 
+    // 通过SSE接收股价推送：连接时收到快照，之后只收到变化的股票
+    startPriceStream() {
+        if (!window.EventSource) return;
+
+        this.priceStream = new EventSource(`${this.apiBase}/stream`);
+        this.priceStream.addEventListener('snapshot', (event) => {
+            this.streamPrices = JSON.parse(event.data).prices || {};
+            this.renderPrices({ prices: this.streamPrices });
+            this.updateLastUpdateTime();
+        });
+        this.priceStream.addEventListener('prices', (event) => {
+            Object.assign(this.streamPrices, JSON.parse(event.data).prices || {});
+            this.renderPrices({ prices: this.streamPrices });
+            this.updateLastUpdateTime();
+        });
+        // 断线后浏览器会带上 Last-Event-ID 自动重连，期间由定时轮询兜底
+    }
+
+    isStreaming() {
+        return this.priceStream && this.priceStream.readyState === EventSource.OPEN;
+    }
+
     bindEvents() {
         const refreshBtn = document.getElementById('refreshBtn');
         if (refreshBtn) {
@@ -58,8 +83,9 @@ class StockMonitor {
     async loadAllData(isManualRefresh = false) {
         try {
             // 不显示loading，保留旧数据
+            // SSE已连接时股价由推送更新，不再轮询
             const [prices, trumpNews, stockNews] = await Promise.all([
-                this.fetchPrices(),
+                this.isStreaming() ? Promise.resolve({ prices: this.streamPrices }) : this.fetchPrices(),
                 this.fetchTrumpNews(),
                 this.fetchStockNews()
             ]);
@@ -34,7 +34,7 @@ class StockData:
                     return cached_data
             
             ticker = yf.Ticker(symbol)
-            data = ticker.history(period="5d", interval="1m")
+            data = ticker.history(period="1d", interval="1m")  # 只用到最后一根K线，不必下载5天
             info = ticker.info
             
             if not data.empty: